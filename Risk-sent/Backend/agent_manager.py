@@ -1,5 +1,5 @@
 import logging
-from app.utils.uploads import wrap_tool_with_context
+from app.utils.uploads import wrap_tool_with_context, PortfolioSearchSchema
 from langchain_groq import ChatGroq
 from langchain_mcp_adapters.client import MultiServerMCPClient
 from langgraph.prebuilt import create_react_agent
@@ -12,8 +12,12 @@ from app.core.config import settings
 from app.services.chat_services import update_chat , get_message_size
 import json
 import asyncio
+import time
 from app.schemas.chat_schema import Message , ChatUpdate
 from app.services.chat_services import add_message
+from app.services.memory_service import ChatMemoryMaintainer
+from app.services.mcp_pool import MCPSessionPool
+from app.services.rag_tools import build_inprocess_search_tool, build_inprocess_portfolio_tool
 import sys
 
 logging.basicConfig(
@@ -36,60 +40,96 @@ class RiskAgentManager:
         
         # 2. Define the MCP Connection
         # This tells the manager WHERE to find the "Specialist"
-        self.mcp_client = MultiServerMCPClient({
-            "risk_server": {
+        if settings.MCP_TRANSPORT == "http":
+            # Standalone retrieval tier: python -m mcp-server.server --transport http
+            server_config = {
+                "url": settings.MCP_SERVER_URL,
+                "transport": "streamable_http",
+            }
+        else:
+            server_config = {
                 "command": "python",
                 "args": ["-m" , "mcp-server.server"], 
                 "transport": "stdio",
             }
-        })
+        self.mcp_client = MultiServerMCPClient({"risk_server": server_config})
         self.cached_tools = None
         self.stack = AsyncExitStack()
         self.base_tools = None
+        # N server processes so concurrent chats don't queue behind one stdio pipe
+        self.mcp_pool = MCPSessionPool(
+            self.mcp_client,
+            "risk_server",
+            size=settings.MCP_POOL_SIZE,
+            health_interval=settings.MCP_HEALTH_INTERVAL
+        )
+        # Compiled once in initialize(): one graph for document chats, one for general chats
+        self.doc_agent = None
+        self.general_agent = None
+
+        # 3. Titles and rolling summaries are generated off the response path
+        self.memory = ChatMemoryMaintainer(self.summarize_messages, self.get_title)
 
 
     async def initialize(self):
-            """Starts the MCP child process and keeps it alive."""
-            logger.info("Starting Persistent MCP Session...")
+            """Starts the MCP child processes and keeps them alive."""
+            logger.info("Starting Persistent MCP Sessions...")
             
-            # 1. Start the child process and enter the session
-            # This is where the 'python -m mcp-server.server' command runs!
-            self.session = await self.stack.enter_async_context(
-                self.mcp_client.session("risk_server")
+            if settings.SEARCH_TOOL_TRANSPORT == "inprocess":
+                # Retrieval runs in this process: no child processes, no JSON-RPC hop
+                self.base_tools = [build_inprocess_search_tool(), build_inprocess_portfolio_tool()]
+                logger.info("Using the in-process search tools.")
+            else:
+                # 1. Start the child processes and enter their sessions
+                # This is where the 'python -m mcp-server.server' command runs!
+                await self.mcp_pool.start()
+
+                # 2. Tool definitions whose calls are spread over the pool
+                self.base_tools = [self._contextual_tool(t) for t in self.mcp_pool.tools()]
+                logger.info("MCP Servers are WARM and tools are cached.")
+
+            # 3. Compile the agents once; doc_id / owner_id reach the tools through the run config
+            started = time.perf_counter()
+            self.doc_agent = create_react_agent(
+                self.llm,
+                tools=[t for t in self.base_tools if t.name != "portfolio_search"]
             )
-            
-            # 2. Pre-load tool definitions through the active pipe
-            self.base_tools = await load_mcp_tools(self.session)
-            logger.info("MCP Server is WARM and tools are cached.")
+            # No document selected: search across everything the user uploaded
+            self.general_agent = create_react_agent(
+                self.llm,
+                tools=[t for t in self.base_tools if t.name != "semantic_search"]
+            )
+            logger.info(f"Agents compiled in {(time.perf_counter() - started) * 1000:.1f}ms")
+
+            self.memory.start()
 
     async def shutdown(self):
-            """Kills the child process. Call this when the app closes."""
+            """Kills the child processes. Call this when the app closes."""
+            await self.memory.stop()
+            await self.mcp_pool.stop()
             await self.stack.aclose()
             logger.info("MCP Child Process terminated.")
 
-    async def get_agent(self , doc_id=None):
-        # MCP tools
-        logger.info("Collecting MCP Tools")
-        mcp_tools = self.base_tools
-        
+    @staticmethod
+    def _contextual_tool(tool):
+        """MCP tools whose scoping argument comes from the run config instead of the LLM."""
+        if tool.name == "semantic_search":
+            return wrap_tool_with_context(tool)
+        if tool.name == "portfolio_search":
+            return wrap_tool_with_context(tool, key="owner_id", args_schema=PortfolioSearchSchema)
+        return tool
+
+    async def get_agent(self , doc_id=None , owner_id=None):
+        """Returns the precompiled agent and the run config carrying the doc_id (or owner_id)."""
+        started = time.perf_counter()
         if doc_id :
-         contextual_tools = [
-         wrap_tool_with_context(t, doc_id) if t.name == "semantic_search" else t 
-         for t in mcp_tools
-         ] 
-
+            agent = self.doc_agent
+            config = {"configurable": {"doc_id": doc_id}}
         else :
-
-          contextual_tools = [
-            t for t in mcp_tools if t.name != "semantic_search"
-          ]  
-
-    
-        agent = create_react_agent(
-            self.llm, 
-            tools=contextual_tools
-        )
-        return agent
+            agent = self.general_agent
+            config = {"configurable": {"owner_id": owner_id}}
+        logger.info(f"get_agent took {(time.perf_counter() - started) * 1000:.3f}ms")
+        return agent, config
 
 
     async def run_query(self, user_input: str, chat , doc_id = None):
@@ -114,7 +154,7 @@ class RiskAgentManager:
             # Step 3: MCP Handshake
             yield json.dumps({"status": "Connecting to MCP", "step": 2}) + "\n"
             logger.info("Getting info about the tools")
-            agent = await self.get_agent(doc_id)
+            agent, config = await self.get_agent(doc_id, str(chat.get("user_id")))
 
             # Step 4: Context-Aware System Prompt
             # Merging your tool constraints with the Contextual Hierarchy logic
@@ -153,12 +193,46 @@ class RiskAgentManager:
             yield json.dumps({"status": "Thinking", "step": 4}) + "\n"
             logger.info("Calling the LLM for decision making")
             
-            # Invoke the agent (LangGraph/LangChain)
-            result = await agent.ainvoke(inputs)
-            final_answer = result["messages"][-1].content
-            
-            for messages in result["messages"] :
-                print(messages)
+            # Stream the agent run (LangGraph): LLM tokens and tool calls are forwarded as they happen
+            final_answer = None
+            tokens = []
+            started = time.perf_counter()
+            first_token_ms = None
+            async for event in agent.astream_events(inputs, config=config, version="v2"):
+                kind = event["event"]
+
+                if kind == "on_chat_model_start":
+                    # Only the tokens of the last model call make up the answer; text streamed by
+                    # an earlier turn (one that ended in a tool call) is discarded by the client
+                    if tokens:
+                        yield json.dumps({"reset": True}) + "\n"
+                    tokens = []
+
+                elif kind == "on_chat_model_stream":
+                    chunk = event["data"]["chunk"]
+                    # Tool-call turns stream arguments, not answer text
+                    if chunk.content and not getattr(chunk, "tool_call_chunks", None):
+                        if first_token_ms is None:
+                            first_token_ms = (time.perf_counter() - started) * 1000
+                            logger.info(f"Time to first token: {first_token_ms:.0f}ms")
+                        tokens.append(chunk.content)
+                        yield json.dumps({"token": chunk.content, "step": 4}) + "\n"
+
+                elif kind == "on_tool_start":
+                    yield json.dumps({"tool": event["name"], "event": "start", "input": event["data"].get("input")}, default=str) + "\n"
+
+                elif kind == "on_tool_end":
+                    yield json.dumps({"tool": event["name"], "event": "end"}) + "\n"
+
+                elif kind == "on_chain_end" and not event.get("parent_ids"):
+                    # Root graph finished: its output is the final agent state
+                    output = event["data"].get("output")
+                    if isinstance(output, dict) and output.get("messages"):
+                        final_answer = output["messages"][-1].content
+
+            if final_answer is None:
+                final_answer = "".join(tokens)
+            logger.info(f"Agent finished in {(time.perf_counter() - started) * 1000:.0f}ms")
 
             # Step 6: Save Assistant Response
             llm_message = Message(
@@ -167,33 +241,19 @@ class RiskAgentManager:
             )
             await add_message(chat_id, llm_message)
 
-            title = None
+            # Step 7: Yield Final Result (the full text, for clients that don't consume tokens)
+            yield json.dumps({"answer": final_answer}) + '\n'
+
+            # Step 8: Title / resummarization happen in the background, after the answer is out
             if not chat["title"] :
-              title = await self.get_title(user_input , final_answer) 
-              
-            #Check if messages multiple of 5 for resummerization
+              self.memory.schedule_title(chat_id , user_input , final_answer)
+
+            #Check if messages multiple of 10 for resummerization
             count = await get_message_size(chat_id)
-            summary = None
-            print(title , summary)
             if count % 10 == 0 :
-                current_summary = chat["summary"]
-                if not current_summary : current_summary = ""
-                summary = await self.summarize_messages(current_summary , chat["messages"])
-            
-            if title or summary :
-                payload = ChatUpdate(
-                title=title ,
-                summary = summary
-                )
-                await update_chat(chat_id , payload)
-               
-            # Step 7: Yield Final Result
-            yield json.dumps({"answer": final_answer}) + '\n'
-            yield json.dumps({"status": "Complete", "step": 5}) + "\n"
+                self.memory.schedule_summary(chat_id)
 
-            # # Step 8: Trigger Background Summarization
-            # # We don't await this so the user gets their answer immediately
-            # asyncio.create_task(self.background_summarize(chat_id))
+            yield json.dumps({"status": "Complete", "step": 5}) + "\n"
 
         except Exception as e:
             logging.error(f"Error occurred while processing the request: {str(e)}")
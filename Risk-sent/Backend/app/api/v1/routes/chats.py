@@ -78,7 +78,9 @@ async def post_message(chat_id: str, request: Request, message: Message , user_i
     # Ask the LLM for the response
     return StreamingResponse(
         agent_manager.run_query(message.content, chat, doc_id),
-        media_type="application/json"
+        media_type="application/x-ndjson",
+        # Don't let proxies buffer the token stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
     
    
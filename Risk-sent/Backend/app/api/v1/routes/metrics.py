@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Depends
+from app.core.auth import get_current_user
+from agent_manager import agent_manager
+from app.services.ai_service import rag_service
+from app.services.redis import redis_client
+from app.services.retrieval_cache import collect_stats
+from app.core.logging import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Counters summed across processes, per section of RagService.stats()
+TOTAL_FIELDS = {
+    "retrieval_cache": ("size", "hits", "redis_hits", "misses"),
+    "query_embedding_cache": ("size", "hits", "misses"),
+    "reranker": ("reranked", "fallbacks", "skipped_busy")
+}
+
+
+def total_stats(processes: dict) -> dict:
+    total = {section: dict.fromkeys(fields, 0) for section, fields in TOTAL_FIELDS.items()}
+    for stats in processes.values():
+        for section, fields in TOTAL_FIELDS.items():
+            for field in fields:
+                total[section][field] += (stats.get(section) or {}).get(field, 0)
+
+    cache = total["retrieval_cache"]
+    lookups = cache["hits"] + cache["redis_hits"] + cache["misses"]
+    cache["hit_ratio"] = round((cache["hits"] + cache["redis_hits"]) / lookups, 4) if lookups else 0.0
+    embeddings = total["query_embedding_cache"]
+    lookups = embeddings["hits"] + embeddings["misses"]
+    embeddings["hit_ratio"] = round(embeddings["hits"] / lookups, 4) if lookups else 0.0
+    return total
+
+
+@router.get("/mcp")
+async def get_mcp_metrics(user_id: str = Depends(get_current_user)):
+    return agent_manager.mcp_pool.stats()
+
+
+@router.get("/retrieval")
+async def get_retrieval_metrics(user_id: str = Depends(get_current_user)):
+    """
+    Retrieval counters of every process that searches (this API and the MCP servers, stdio or
+    HTTP), as last reported to Redis (every RETRIEVAL_STATS_INTERVAL seconds), and their sum.
+    """
+    try:
+        processes = await collect_stats(redis_client)
+    except Exception as e:
+        logger.error(f"Error collecting retrieval stats from redis {str(e)}")
+        processes = {}
+    # This process' own counters are always current
+    processes[rag_service.retrieval_cache.process] = rag_service.stats()
+    return {
+        "total": total_stats(processes),
+        "processes": processes
+    }
@@ -3,8 +3,9 @@ from fastapi import APIRouter, HTTPException, UploadFile, File, Depends , Backgr
 from app.core.auth import get_current_user
 from app.db.client import mongo_client
 from app.services.ai_service import rag_service
-from app.utils.uploads import extract_text_from_pdf
-import pdfplumber
+from app.utils.uploads import extract_text_from_pdf, save_upload_stream, UploadTooLarge, NotAPdf
+from app.core.config import settings
+from fastapi.concurrency import run_in_threadpool
 from app.core.logging import logger
 from uuid import uuid4
 from typing import List
@@ -13,6 +14,7 @@ from pathlib import Path
 from bson import ObjectId
 from app.services.redis import redis_client
 import json
+import asyncio
 
 PROJECT_ROOT = Path(__file__).resolve().parents[3]
 UPLOAD_DIR = PROJECT_ROOT / "uploads" / "pdfs"
@@ -20,6 +22,12 @@ UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
 router = APIRouter()
 
+def parser_file_path(file_path : Path) -> str :
+    """Where the parse worker finds an upload: same path, unless it sees the directory elsewhere."""
+    if settings.PARSER_UPLOAD_DIR :
+        return f"{settings.PARSER_UPLOAD_DIR.rstrip('/')}/{file_path.name}"
+    return str(file_path)
+
 @router.post("/")
 async def upload_new_document(
     background_tasks: BackgroundTasks,
@@ -30,21 +38,26 @@ async def upload_new_document(
     if file.content_type != "application/pdf":
         raise HTTPException(status_code=400, detail="Only PDF files allowed")
 
+    # 2. Stream to disk in fixed-size chunks, hashing and enforcing the size limit on the way
+    unique_id = uuid4()
+    file_path = UPLOAD_DIR / f"{unique_id}.pdf"
     try:
-        # 2. Calculate file size (MB)
-        file.file.seek(0, 2)  # move cursor to end
-        file_size_bytes = file.file.tell()
-        file.file.seek(0)
+        file_size_bytes, file_hash = await save_upload_stream(
+            file,
+            file_path,
+            max_bytes=settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024,
+            chunk_size=settings.UPLOAD_CHUNK_SIZE
+        )
+    except UploadTooLarge:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"File larger than {settings.MAX_UPLOAD_SIZE_MB} MB")
+    except NotAPdf:
+        raise HTTPException(status_code=400, detail="Only PDF files allowed")
 
+    try:
         file_size_mb = round(file_size_bytes / (1024 * 1024), 2)
 
-        # 3. Count pages using pdfplumber
-        with pdfplumber.open(file.file) as pdf:
-            total_pages = len(pdf.pages)
-
-        # reset cursor again (VERY IMPORTANT)
-        file.file.seek(0)
-        logger.info(f"Got ingestion request of file of size ${file_size_mb} and ${total_pages} pages")
+        # 3. Page count is filled in by the parse worker, which reads the pages anyway
+        logger.info(f"Got ingestion request of file of size ${file_size_mb}")
         # 5. Build DB document (matches schema exactly)
         document = {
             "owner_id": user_id,
@@ -54,27 +67,45 @@ async def upload_new_document(
             "percent_complete" : 0,
             "number_of_chunk_processed" : 0 ,
             "number_of_parent_chunks" : 0 ,
+            "content_hash" : file_hash ,
             "metadata": {
-                "total_pages": total_pages,
+                "total_pages": None,
                 "file_size_mb": file_size_mb
             }
         }
 
-        # Save to disk
-        unique_id = uuid4()
-        file_path = UPLOAD_DIR / f"{unique_id}.pdf"
-        with open(file_path, "wb") as f:
-          f.write(await file.read())
+        # Same bytes already processed (by anyone): reference its parents/children, no parse/embed
+        source = await mongo_client.db.document.find_one(
+            {"content_hash" : file_hash , "status" : "processed" , "source_doc_id" : {"$exists" : False}}
+        )
+        if source :
+            document.update({
+                "status" : "processed" ,
+                "percent_complete" : 100 ,
+                "number_of_chunk_processed" : source["number_of_chunk_processed"] ,
+                "number_of_parent_chunks" : source["number_of_parent_chunks"] ,
+                "source_doc_id" : str(source["_id"])
+            })
+            document["metadata"]["total_pages"] = source.get("metadata", {}).get("total_pages")
+            await mongo_client.db.document.insert_one(document)
+            document["_id"] = str(document["_id"])
+            await run_in_threadpool(file_path.unlink, True)
+            logger.info(f"doc_id={document['_id']} deduplicated against doc_id={document['source_doc_id']}")
+            return {
+                "status": "success",
+                "document_id": document["_id"],
+                "message": "File uploaded successfully"
+            }
 
-        # 6. Insert into MongoDB
-        linux_file_path = f"/mnt/c/Users/Lenovo/OneDrive/Desktop/DE Shaw/Risk-sent/Backend/app/uploads/pdfs/{unique_id}.pdf"
+        # 6. Insert into MongoDB (the stored PDF is removed with the document)
+        document["file_path"] = str(file_path)
         await mongo_client.db.document.insert_one(document)
         document["_id"] = str(document["_id"])
         job_id = str(uuid4())
         job_payload = {
             "job_id" : job_id ,
             "doc_id" : document["_id"] ,
-            "file_path" : str(linux_file_path) ,
+            "file_path" : parser_file_path(file_path) ,
             "user_id" : user_id
         }
         await redis_client.lpush("parse_queue" , json.dumps(job_payload))
@@ -105,6 +136,20 @@ async def get_doc(request : Request , user_id: str = Depends(get_current_user))
         doc["_id"] = str(doc["_id"])
     return docs
 
+@router.post("/search")
+async def search_documents(request : Request , user_id: str = Depends(get_current_user)) :
+    """One query over several of the user's documents ("doc_ids"), or all of them when omitted."""
+    data = await request.json()
+    docs = await rag_service.search_portfolio(
+        query=data["query"] ,
+        owner_id=user_id ,
+        doc_ids=data.get("doc_ids") ,
+        limit=data.get("limit", 5)
+    )
+    for doc in docs :
+        doc["_id"] = str(doc["_id"])
+    return docs
+
 @router.get("/me")
 async def get_my_document(user_id: str = Depends(get_current_user)) :
       try :
@@ -128,6 +173,43 @@ async def check_document(doc_id : str) :
     except Exception as e :
         logger.error(f"Error occured while checking the document status {str(e)}")         
 
+@router.get("/{doc_id}/pages/{page}")
+async def get_page_context(doc_id : str , page : int , window : int = 1 , user_id: str = Depends(get_current_user)) :
+    doc = await mongo_client.db.document.find_one({"_id" : ObjectId(doc_id) , "owner_id" : user_id})
+    if not doc :
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
+    return await rag_service.fetch_neighbors(doc_id , page , window)
+
+@router.delete("/{doc_id}")
+async def delete_document(doc_id : str , user_id: str = Depends(get_current_user)) :
+    doc = await mongo_client.db.document.find_one({"_id" : ObjectId(doc_id) , "owner_id" : user_id})
+    if not doc :
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
+
+    await mongo_client.db.document.delete_one({"_id" : doc["_id"]})
+    if doc.get("file_path") :
+        await run_in_threadpool(Path(doc["file_path"]).unlink, True)
+
+    # Chunks are stored under the source document and shared with its deduplicated uploads:
+    # only drop them once neither the source nor any alias of it is left
+    source_id = doc.get("source_doc_id") or doc_id
+    still_referenced = (
+        await mongo_client.db.document.count_documents({"_id" : ObjectId(source_id)}, limit=1)
+        or await mongo_client.db.document.count_documents({"source_doc_id" : source_id}, limit=1)
+    )
+    if not still_referenced :
+        await asyncio.gather(
+            mongo_client.db.children.delete_many({"doc_id" : source_id}) ,
+            mongo_client.db.parents.delete_many({"doc_id" : source_id})
+        )
+        # Cached search results and FAISS partitions, in every process
+        await rag_service.retrieval_cache.invalidate(source_id)
+    if source_id != doc_id :
+        # Forget the alias mapping and anything cached under the alias id
+        await rag_service.retrieval_cache.invalidate(doc_id)
+    logger.info(f"doc_id={doc_id} deleted by user={user_id}")
+    return {"ok" : True}
+
 @router.get("/debug")
 async def get_doc_debug(request : Request , user_id: str = Depends(get_current_user)) : 
     data = await request.json()
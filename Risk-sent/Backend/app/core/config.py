@@ -18,11 +18,74 @@ class Settings(BaseSettings):
     SYSTEM_ENV : str = Field(..., env="SYSTEM_ENV")
     REDIS_SERVER_URL : str = Field(... , env="REDIS_SERVER_URL")
     EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    EMBEDDING_BACKEND: str = "local"  # "local" (model in this process) or "remote" (shared embedding daemon)
+    EMBEDDING_REQUEST_TIMEOUT: int = 30
+    EMBEDDING_DAEMON_MAX_BATCH: int = 256
+    EMBEDDING_DAEMON_BATCH_WINDOW_MS: float = 5
+    EMBEDDING_POOL_KIND: str = "process"  # "process" or "thread"
+    EMBEDDING_POOL_WORKERS: int = 0  # 0 = one per core
+    EMBEDDING_TORCH_THREADS: int = 1
+    EMBEDDING_POOL_MAX_PENDING: int = 0  # 0 = 2 shards per worker
     LLM_REPO_ID: str = "mistralai/Mistral-7B-Instruct-v0.3"
     
     # Storage
     UPLOAD_DIR: str = "data/uploads"
     VECTOR_STORE_DIR: str = "data/vector_store"
+    MAX_UPLOAD_SIZE_MB: int = 200
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+
+    # Workers
+    UPLOAD_WORKER_CONCURRENCY: int = 6
+    UPLOAD_WORKER_ID: str = ""  # defaults to hostname:pid; a dead worker's jobs are requeued once its heartbeat expires
+    UPLOAD_WORKER_DRAIN_TIMEOUT: float = 60
+    CHUNK_EMBEDDING_MEMO: bool = True  # reuse embeddings of chunk texts seen in earlier uploads
+    PARSER_STREAMING: bool = True  # stream pages from the C++ parser into the splitter
+    PARSER_ENGINE: str = "cpp"  # "cpp" or "python"
+    PARSER_EXECUTABLE: str = "/mnt/c/Users/Lenovo/OneDrive/Desktop/DE Shaw/Risk-sent/Backend/app/workers/worker"  # build from app/workers/worker.cpp
+    PARSER_POOL_SIZE: int = 1
+    PARSER_LAUNCHER: str = "wsl"  # prefix for the C++ binary, "" to exec it directly
+    PARSER_UPLOAD_DIR: str = ""  # the uploads/pdfs directory as the parser sees it (e.g. a WSL /mnt/c path), "" = same path as the API
+    PARSER_HEALTH_INTERVAL: float = 5
+    PARSER_JOB_TIMEOUT: float = 600
+    PYTHON_PARSER_WORKERS: int = 0  # 0 = one per core
+    PYTHON_PARSER_PAGES_PER_TASK: int = 8
+    PYTHON_PARSER_BACKEND: str = "pdfplumber"  # "pdfplumber" or "pypdf"
+
+    # Retrieval
+    VECTOR_STORE_BACKEND: str = "atlas"  # "atlas" ($vectorSearch) or "faiss" (in-process HNSW)
+    # How children store their vectors: "float32" (array), "float16" (FAISS backend only) or "int8"
+    EMBEDDING_STORAGE: str = "float32"
+    FAISS_HNSW_M: int = 32
+    FAISS_EF_SEARCH: int = 64
+    FAISS_MAX_PARTITIONS: int = 32
+    QUERY_EMBEDDING_CACHE_SIZE: int = 1024
+    QUERY_EMBEDDING_BATCH_WINDOW_MS: float = 5
+    QUERY_EMBEDDING_MAX_BATCH: int = 32
+    RETRIEVAL_MODE: str = "vector"  # "vector" or "hybrid" (vector + BM25, reciprocal rank fusion)
+    HYBRID_VECTOR_WEIGHT: float = 1.0
+    HYBRID_LEXICAL_WEIGHT: float = 1.0
+    HYBRID_RRF_K: int = 60
+    HYBRID_CANDIDATES: int = 20  # taken from each ranking before fusion
+    RERANK_ENABLED: bool = False  # cross-encoder pass over the retrieved parents
+    RERANK_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_CANDIDATES: int = 20  # children retrieved for the reranker to choose from
+    RERANK_TOP_K: int = 5
+    RERANK_TIMEOUT_MS: float = 300
+    RERANK_MERGE_TIMEOUT_MS: float = 300  # portfolio merge: scores the candidates of documents whose rerank fell back
+    PORTFOLIO_MAX_DOCS: int = 50  # documents a portfolio search fans out to
+    PORTFOLIO_MAX_CONCURRENCY: int = 8
+    SEARCH_TOKEN_BUDGET: int = 1500  # context tokens semantic_search may return per call
+    RETRIEVAL_CACHE_SIZE: int = 512
+    RETRIEVAL_CACHE_TTL: float = 300
+    RETRIEVAL_CACHE_REDIS: bool = False  # share cached results across processes through Redis
+    RETRIEVAL_STATS_INTERVAL: float = 10  # seconds between reports of each process' retrieval counters to Redis (0: off)
+
+    # Agent
+    SEARCH_TOOL_TRANSPORT: str = "mcp"  # "mcp" (server processes) or "inprocess" (call rag_service directly)
+    MCP_TRANSPORT: str = "stdio"  # "stdio" (spawn server children) or "http" (remote streamable HTTP server)
+    MCP_SERVER_URL: str = "http://127.0.0.1:8001/mcp"
+    MCP_POOL_SIZE: int = 2
+    MCP_HEALTH_INTERVAL: float = 10
 
     # Load from .env file
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
@@ -20,6 +20,23 @@ class MongoClient:
         )
         logger.info("Database connected")
         self.db = self.client[settings.MONGO_DB_NAME]
+        await self.ensure_indexes()
+
+    async def ensure_indexes(self):
+        """
+        Idempotent, safe to run on every startup
+        """
+        try:
+            # Page-scoped neighbour lookups (RiskSentAIService.fetch_neighbors)
+            await self.db.parents.create_index(
+                [("doc_id", 1), ("metadata.page_start", 1), ("metadata.page_end", 1)]
+            )
+            # Inverted index for BM25 (LexicalIndex): one entry per distinct term of a child
+            await self.db.children.create_index([("doc_id", 1), ("lexical.terms", 1)])
+            # Upload dedup by file content
+            await self.db.document.create_index([("content_hash", 1), ("status", 1)])
+        except Exception as e:
+            logger.error(f"Error creating indexes {str(e)}")
 
 
     async def close(self):
@@ -1,9 +1,12 @@
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from app.db.client import mongo_client
 from app.api.v1.router import api_router
 from agent_manager import agent_manager
+from app.services.ai_service import rag_service
+from app.core.config import settings
 from contextlib import asynccontextmanager
 
 
@@ -12,6 +15,9 @@ async def lifespan(app: FastAPI):
     # --- STARTUP LOGIC ---    
     await agent_manager.initialize() 
     await mongo_client.connect()
+    # The search routes rerank in this process: load the cross-encoder before the first query
+    if rag_service.reranker :
+        rag_service.reranker.preload()
     yield # The app stays here while running
     
     # --- SHUTDOWN LOGIC ---
@@ -22,6 +28,26 @@ async def lifespan(app: FastAPI):
 
 app = FastAPI(title="Risk-Sensing AI" , lifespan = lifespan)
 
+# Room for the multipart boundaries and part headers around the file
+MULTIPART_OVERHEAD = 64 * 1024
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    # Starlette spools the whole multipart body before the route runs, so an announced size
+    # over the limit is refused before anything is read (chunked bodies are still capped while
+    # copying, see save_upload_stream)
+    content_length = request.headers.get("content-length")
+    if (
+        request.headers.get("content-type", "").startswith("multipart/form-data")
+        and content_length and content_length.isdigit()
+        and int(content_length) > settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024 + MULTIPART_OVERHEAD
+    ):
+        return JSONResponse(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            content={"detail": f"File larger than {settings.MAX_UPLOAD_SIZE_MB} MB"}
+        )
+    return await call_next(request)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -1,12 +1,24 @@
 import asyncio
+import time
 from typing import Any, List
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 from app.core.logging import logging
-from app.utils.uploads import extract_text_from_pdf
+from app.utils.uploads import extract_text_from_pdf, extract_pages_from_pdf
+from app.utils.chunking import StreamingSplitter, child_chunks_metadata
 from app.db.client import mongo_client
+from app.services.vector_store import build_vector_store
+from app.services.embedding_cache import CachedEmbeddings
+from app.services.embedding_client import build_embeddings
+from app.services.retrieval_cache import RetrievalCache
+from app.services.lexical_search import LexicalIndex, reciprocal_rank_fusion
+from app.utils.lexical import lexical_fields
+from app.utils.vector_codec import encode_embedding, encode_query_vector
+from app.utils.context_packing import pack_context, group_by_parent
+from app.services.reranker import CrossEncoderReranker
+from app.services.redis import redis_client
+from app.core.config import settings
 from bson import ObjectId
 from fastapi import UploadFile
 
@@ -16,14 +28,42 @@ logger = logging.getLogger(__name__)
 class RiskSentAIService:
     def __init__(self):
         # 1. Initialize Embeddings (384 dimensions for all-MiniLM-L6-v2)
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2",
-            model_kwargs={'device': 'cpu'}
+        # Local model, or the shared embedding daemon when EMBEDDING_BACKEND="remote"
+        self.embeddings = build_embeddings()
+        # Query side: LRU + micro-batching so repeated agent queries skip the model
+        self.query_embeddings = CachedEmbeddings(
+            self.embeddings,
+            max_size=settings.QUERY_EMBEDDING_CACHE_SIZE,
+            batch_window_ms=settings.QUERY_EMBEDDING_BATCH_WINDOW_MS,
+            max_batch_size=settings.QUERY_EMBEDDING_MAX_BATCH
         )
         
         # 2. Splitters
         self.parent_splitter = RecursiveCharacterTextSplitter(chunk_size=1500, chunk_overlap=150)
         self.child_splitter = RecursiveCharacterTextSplitter(chunk_size=400, chunk_overlap=40)
+
+        # 3. Vector search backend (Atlas $vectorSearch or local FAISS partitions)
+        self.vector_store = build_vector_store()
+        # Optional cross-encoder over the retrieved parents
+        self.reranker = None
+        if settings.RERANK_ENABLED:
+            self.reranker = CrossEncoderReranker(settings.RERANK_MODEL, timeout_ms=settings.RERANK_TIMEOUT_MS)
+        # BM25 over the children's lexical fields, fused with vector results in hybrid mode
+        self.lexical_index = LexicalIndex()
+        # doc_id -> doc_id owning the parents/children (differs for deduplicated uploads)
+        self.content_doc_ids = {}
+
+        # 4. Search results per (doc_id, query); invalidated on re-ingest/delete from any process
+        self.retrieval_cache = RetrievalCache(
+            max_size=settings.RETRIEVAL_CACHE_SIZE,
+            ttl=settings.RETRIEVAL_CACHE_TTL,
+            redis=redis_client,
+            shared=settings.RETRIEVAL_CACHE_REDIS,
+            on_invalidate=self._on_invalidate,
+            namespace=f"{settings.RETRIEVAL_MODE}:{settings.SEARCH_TOKEN_BUDGET}:{settings.RERANK_ENABLED}",
+            stats_source=self.stats,
+            report_interval=settings.RETRIEVAL_STATS_INTERVAL
+        )
         self.db = None
         if mongo_client.db is not None :
             self.db = mongo_client.db
@@ -42,9 +82,9 @@ class RiskSentAIService:
         loop = asyncio.get_running_loop()
 
         # MOVE PDF extraction OFF the event loop
-        text = await loop.run_in_executor(
+        pages = await loop.run_in_executor(
             None,
-            extract_text_from_pdf,
+            extract_pages_from_pdf,
             file_path
         )
 
@@ -53,8 +93,12 @@ class RiskSentAIService:
         if self.db is None:
             await self.connect_to_db()
 
-        initial_doc = Document(page_content=text, metadata={"source": doc_id})
-        parent_docs = self.parent_splitter.split_documents([initial_doc])
+        # Page-aware split: every parent knows its page span and character offsets
+        splitter = StreamingSplitter(self.parent_splitter, {"source": doc_id})
+        parent_docs = []
+        for page_number, page_text in enumerate(pages, start=1):
+            parent_docs.extend(splitter.feed(page_text, page_number))
+        parent_docs.extend(splitter.flush())
 
         number_of_parent_chunks = len(parent_docs)
         number_of_chunk_processed = 0
@@ -86,15 +130,18 @@ class RiskSentAIService:
                     child_docs
                 )
 
+                child_metadata = child_chunks_metadata(p_doc.metadata, p_doc.page_content, child_docs, self.child_splitter._chunk_overlap)
                 child_records = [
                     {
                         "parent_id": parent_insert.inserted_id,
                         "doc_id": doc_id,
                         "owner_id": user_id,
-                        "embedding": vector,
-                        "text_snippet": c_text
+                        **encode_embedding(vector, settings.EMBEDDING_STORAGE),
+                        "text_snippet": c_text,
+                        "metadata": c_metadata,
+                        "lexical": lexical_fields(c_text)
                     }
-                    for c_text, vector in zip(child_docs, embeddings)
+                    for c_text, vector, c_metadata in zip(child_docs, embeddings, child_metadata)
                 ]
 
                 if child_records:
@@ -107,58 +154,212 @@ class RiskSentAIService:
             {"$set": {"status": "processed" , "percent_complete" : 100}}
         )
 
+        # Drops cached results and the FAISS partition in every process
+        await self.retrieval_cache.invalidate(doc_id)
         logger.info(f"Ingestion complete for {doc_id}")
 
+    def stats(self) -> dict:
+        """Retrieval counters of this process."""
+        return {
+            "retrieval_cache": self.retrieval_cache.stats(),
+            "query_embedding_cache": self.query_embeddings.stats(),
+            "reranker": self.reranker.stats() if self.reranker else None
+        }
+
+    def _on_invalidate(self, doc_id: str):
+        self.vector_store.evict(doc_id)
+        self.lexical_index.evict(doc_id)
+        self.content_doc_ids.pop(doc_id, None)
+
+    async def resolve_doc_id(self, doc_id: str) -> str:
+        """Deduplicated uploads point at the document whose chunks they share."""
+        content_doc_id = self.content_doc_ids.get(doc_id)
+        if content_doc_id is None:
+            if self.db is None:
+                await self.connect_to_db()
+            doc = await self.db.document.find_one({"_id": ObjectId(doc_id)}, {"source_doc_id": 1})
+            content_doc_id = (doc or {}).get("source_doc_id") or doc_id
+            # Aliases never change, so this is safe to keep for the life of the process
+            self.content_doc_ids[doc_id] = content_doc_id
+        return content_doc_id
+
     async def search_risks(self, query: str, doc_id: str):
             """Finds 'Parent' context by searching 'Child' vectors with doc filters."""
             try :
                 if self.db is None :
                  await self.connect_to_db()
-                query_vector = self.embeddings.embed_query(query)
-                logger.info(f"Search result: {len(query_vector)}")
-                pipeline = [
-                    {
-                        "$vectorSearch": {
-                            "index": "vector_index", 
-                            "path": "embedding",
-                            "queryVector": query_vector,
-                            "numCandidates": 100,
-                            "limit": 5,
-                            "filter": {
-                                "$and": [
-                                    {"doc_id": doc_id}
-                                ]
-                            }
-                        }
-                    },
-                    {
-                        # Join with Parents to get the full context
-                        "$lookup": {
-                            "from": "parents",
-                            "localField": "parent_id",
-                            "foreignField": "_id",
-                            "as": "parent_context"
-                        }
-                    },
-                    { "$unwind": "$parent_context" },
-                    {
-                        "$project": {
-                            "text": "$parent_context.text",
-                            "page": "$parent_context.metadata.page",
-                            "score": {"$meta": "vectorSearchScore"}
-                        }
-                    }
-                ]
-                
-                cursor = self.db.children.aggregate(pipeline)
-                results = await cursor.to_list(length=5)
+                doc_id = await self.resolve_doc_id(doc_id)
+
+                generation = self.retrieval_cache.generation(doc_id)
+                cached = await self.retrieval_cache.get(doc_id, query, limit=5)
+                if cached is not None:
+                    logger.info(f"Retrieval cache hit, {self.retrieval_cache.stats()}")
+                    return cached
+
+                query_vector = await self.query_embeddings.aembed_query(query)
+                logger.info(f"Search result: {len(query_vector)} , query embedding cache {self.query_embeddings.stats()}")
+                # The reranker picks from a wider candidate set
+                limit = settings.RERANK_CANDIDATES if self.reranker else 5
+                if settings.RETRIEVAL_MODE == "hybrid":
+                    results = await self.hybrid_search(query, query_vector, doc_id, limit=limit)
+                else:
+                    results = await self.vector_store.search(query_vector, doc_id, limit=limit)
                 print(f"DEBUG: Found {len(results)} child chunks.")
+
+                fell_back = False
+                if self.reranker:
+                    results, fell_back = await self.reranker.rerank(query, group_by_parent(results), top_k=settings.RERANK_TOP_K)
+
+                # One entry per parent, best first, within the prompt budget
+                results, tokens_before, tokens_after = pack_context(results, settings.SEARCH_TOKEN_BUDGET)
+                logger.info(
+                    f"Packed {len(results)} parents, ~{tokens_after} tokens "
+                    f"(saved ~{tokens_before - tokens_after} of {tokens_before})"
+                )
+                # Retrieval-order fallbacks would otherwise be served under the rerank namespace
+                if not fell_back:
+                    await self.retrieval_cache.put(doc_id, query, results, limit=5, generation=generation)
                 return results
                 
             except Exception as e:
                 logger.error(f"Error during document retrieval: {str(e)}")
                 return []
 
+    async def search_portfolio(self, query: str, owner_id: str, doc_ids: List[str] = None, limit: int = 5):
+        """
+        search_risks over several documents of `owner_id` (the most recent processed ones when
+        `doc_ids` is empty), in parallel, merged into one global top-`limit` packed into the token
+        budget. Deduplicated uploads of the same file are searched once.
+        The query is embedded once: concurrent identical queries share one embedding call.
+        """
+        if self.db is None:
+            await self.connect_to_db()
+
+        filters = {"owner_id": owner_id, "status": "processed"}
+        if doc_ids:
+            filters["_id"] = {"$in": [ObjectId(d) for d in doc_ids if ObjectId.is_valid(d)]}
+        cursor = self.db.document.find(filters, {"filename": 1, "source_doc_id": 1}).sort("upload_date", -1)
+        documents = await cursor.to_list(length=settings.PORTFOLIO_MAX_DOCS)
+
+        # Aliases share their source's chunks: keep the most recent document per content
+        by_content = {}
+        for document in documents:
+            by_content.setdefault(document.get("source_doc_id") or str(document["_id"]), document)
+        documents = list(by_content.values())
+        if not documents:
+            return []
+
+        semaphore = asyncio.Semaphore(settings.PORTFOLIO_MAX_CONCURRENCY)
+
+        async def search_one(document):
+            async with semaphore:
+                results = await self.search_risks(query, str(document["_id"]))
+            for result in results:
+                result["doc_id"] = str(document["_id"])
+                result["filename"] = document.get("filename")
+            return results
+
+        started = time.perf_counter()
+        per_document = await asyncio.gather(*(search_one(d) for d in documents))
+        merged = await self._merge_scores(query, [r for results in per_document for r in results])
+        merged = sorted(merged, key=lambda r: r.get("score", 0), reverse=True)[:limit]
+        results, _, tokens = pack_context(merged, settings.SEARCH_TOKEN_BUDGET)
+        logger.info(
+            f"Portfolio search over {len(documents)} documents took {(time.perf_counter() - started) * 1000:.0f}ms, "
+            f"{len(results)} results, ~{tokens} tokens"
+        )
+        return results
+
+    async def _merge_scores(self, query: str, candidates: List[dict]) -> List[dict]:
+        """
+        Puts the results of several documents on one scale. Results reranked per document
+        (they carry `retrieval_score`) already have comparable cross-encoder scores; only the
+        candidates of documents whose rerank fell back are scored, within their own budget.
+        If that falls back too, every candidate is ranked by its retrieval score.
+        """
+        unscored = [r for r in candidates if "retrieval_score" not in r]
+        if not self.reranker or not unscored:
+            return candidates
+        scored = [r for r in candidates if "retrieval_score" in r]
+        if not scored:
+            # Nothing on the cross-encoder scale yet: all of them are retrieval scores
+            return candidates
+
+        reranked, fell_back = await self.reranker.rerank(
+            query, unscored, top_k=len(unscored), timeout_ms=settings.RERANK_MERGE_TIMEOUT_MS
+        )
+        if not fell_back:
+            return scored + reranked
+        return [dict(r, score=r.get("retrieval_score", r.get("score", 0))) for r in candidates]
+
+    async def hybrid_search(self, query: str, query_vector, doc_id: str, limit: int = 5):
+        """Vector and BM25 rankings of the children, merged with reciprocal rank fusion."""
+        dense, lexical = await asyncio.gather(
+            self.vector_store.search(query_vector, doc_id, limit=settings.HYBRID_CANDIDATES),
+            self.lexical_index.search(query, doc_id, limit=settings.HYBRID_CANDIDATES)
+        )
+        fused = reciprocal_rank_fusion(
+            [dense, lexical],
+            [settings.HYBRID_VECTOR_WEIGHT, settings.HYBRID_LEXICAL_WEIGHT],
+            k=settings.HYBRID_RRF_K
+        )[:limit]
+
+        # Vector hits already carry their parent; lexical-only hits need it fetched
+        by_id = {r["_id"]: r for r in dense}
+        lexical_parents = {r["_id"]: r["parent_id"] for r in lexical}
+        missing = [lexical_parents[_id] for _id, _ in fused if _id not in by_id]
+        parents = {}
+        if missing:
+            cursor = self.db.parents.find(
+                {"_id": {"$in": missing}},
+                {"text": 1, "metadata.page": 1, "metadata.page_end": 1}
+            )
+            parents = {p["_id"]: p for p in await cursor.to_list(length=None)}
+
+        results = []
+        for _id, score in fused:
+            if _id in by_id:
+                result = dict(by_id[_id])
+            else:
+                parent = parents.get(lexical_parents[_id])
+                if parent is None:
+                    continue
+                result = {
+                    "_id": _id,
+                    "parent_id": parent["_id"],
+                    "text": parent["text"],
+                    "page": parent.get("metadata", {}).get("page"),
+                    "page_end": parent.get("metadata", {}).get("page_end")
+                }
+            result["score"] = score
+            results.append(result)
+        return results
+
+    async def fetch_neighbors(self, doc_id: str, page: int, window: int = 1):
+        """Parent chunks overlapping pages [page - window, page + window], in document order."""
+        if self.db is None:
+            await self.connect_to_db()
+        doc_id = await self.resolve_doc_id(doc_id)
+        # Served by the (doc_id, metadata.page_start, metadata.page_end) index on parents
+        cursor = self.db.parents.find(
+            {
+                "doc_id": doc_id,
+                "metadata.page_start": {"$lte": page + window},
+                "metadata.page_end": {"$gte": page - window}
+            },
+            {"text": 1, "metadata.page_start": 1, "metadata.page_end": 1, "metadata.char_start": 1}
+        ).sort("metadata.char_start", 1)
+        parents = await cursor.to_list(length=None)
+        return [
+            {
+                "_id": str(p["_id"]),
+                "text": p["text"],
+                "page": p["metadata"]["page_start"],
+                "page_end": p["metadata"]["page_end"]
+            }
+            for p in parents
+        ]
+
     async def debug_search(self , query , user_id, doc_id):
         # STAGE 1: Check if Vector Search even finds the children
         query_vector = self.embeddings.embed_query(query)
@@ -167,7 +368,7 @@ class RiskSentAIService:
                         "$vectorSearch": {
                             "index": "vector_index", 
                             "path": "embedding",
-                            "queryVector": query_vector,
+                            "queryVector": encode_query_vector(query_vector, settings.EMBEDDING_STORAGE),
                             "numCandidates": 100,
                             "limit": 5,
                             "filter": {
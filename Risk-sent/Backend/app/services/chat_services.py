@@ -64,6 +64,32 @@ async def update_chat(chat_id: str, payload: ChatUpdate) -> Optional[dict]:
     return await get_chat_by_id(chat_id)
 
 
+async def set_chat_title_if_empty(chat_id: str, title: str) -> bool:
+    if not ObjectId.is_valid(chat_id):
+        return False
+    res = await mongo_client.db.chats.update_one(
+        {"_id": ObjectId(chat_id), "title": {"$in": [None, ""]}},
+        {"$set": {"title": title, "updated_at": datetime.utcnow()}}
+    )
+    return res.modified_count == 1
+
+
+async def update_chat_summary_if_version(chat_id: str, summary: str, expected_version: int) -> bool:
+    """Optimistic write: only applies if nobody bumped summary_version since we read it."""
+    if not ObjectId.is_valid(chat_id):
+        return False
+    # Chats created before versioning have no summary_version field, which counts as 0
+    version_filter = {"$in": [0, None]} if expected_version == 0 else expected_version
+    res = await mongo_client.db.chats.update_one(
+        {"_id": ObjectId(chat_id), "summary_version": version_filter},
+        {
+            "$set": {"summary": summary, "updated_at": datetime.utcnow()},
+            "$inc": {"summary_version": 1}
+        }
+    )
+    return res.modified_count == 1
+
+
 async def delete_chat(chat_id: str) -> bool:
     if not ObjectId.is_valid(chat_id):
         return False
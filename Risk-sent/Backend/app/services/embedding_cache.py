@@ -0,0 +1,124 @@
+import asyncio
+import re
+from collections import OrderedDict
+from typing import List
+from app.core.logging import logging
+
+## Setting up logger
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(text: str) -> str:
+    """Cache key for a query: case and whitespace differences should not miss."""
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+class CachedEmbeddings:
+    """
+    Query-embedding front for an Embeddings instance.
+
+    Keeps a bounded LRU keyed on the normalized query and micro-batches the misses:
+    queries arriving within `batch_window_ms` of each other are embedded with a single
+    `aembed_documents` call, which runs off the event loop.
+    """
+
+    def __init__(self, embeddings, max_size: int = 1024, batch_window_ms: float = 5, max_batch_size: int = 32):
+        self.embeddings = embeddings
+        self.max_size = max_size
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_size = max_batch_size
+
+        self.cache: OrderedDict[str, List[float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        # key -> future shared by every caller waiting on the same text
+        self.pending: dict[str, asyncio.Future] = {}
+        self.timer_armed = False
+        self.full_armed = False
+        # Keeps flushes referenced while they run
+        self.flush_tasks = set()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = normalize_query(text)
+
+        vector = self.cache.get(key)
+        if vector is not None:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return vector
+
+        self.misses += 1
+        future = self.pending.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self.pending[key] = future
+            if len(self.pending) >= self.max_batch_size:
+                self._schedule_flush(0)
+            else:
+                self._schedule_flush(self.batch_window)
+
+        # shield so one cancelled caller doesn't cancel the result for the others
+        return await asyncio.shield(future)
+
+    def _schedule_flush(self, delay):
+        # At most one flush of each kind waits to take a batch: a full batch goes out right
+        # away, anything else waits out the window with the keys that ride along
+        if delay > 0:
+            if self.timer_armed:
+                return
+            self.timer_armed = True
+        else:
+            if self.full_armed:
+                return
+            self.full_armed = True
+        task = asyncio.create_task(self._flush(delay))
+        self.flush_tasks.add(task)
+        task.add_done_callback(self.flush_tasks.discard)
+
+    async def _flush(self, delay):
+        try:
+            if delay:
+                await asyncio.sleep(delay)
+        finally:
+            if delay:
+                self.timer_armed = False
+            else:
+                self.full_armed = False
+
+        # Never more than max_batch_size texts per call, the rest waits for the next flush
+        keys = list(self.pending.keys())[: self.max_batch_size]
+        batch = {key: self.pending.pop(key) for key in keys}
+        if self.pending:
+            self._schedule_flush(0 if len(self.pending) >= self.max_batch_size else self.batch_window)
+        if not batch:
+            return
+
+        try:
+            vectors = await self.embeddings.aembed_documents(keys)
+        except Exception as e:
+            logger.error(f"Error while embedding a batch of {len(keys)} queries: {str(e)}")
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for key, vector in zip(keys, vectors):
+            self._put(key, vector)
+            if not batch[key].done():
+                batch[key].set_result(vector)
+
+    def _put(self, key, vector):
+        self.cache[key] = vector
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self.cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0
+        }
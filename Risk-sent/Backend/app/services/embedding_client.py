@@ -0,0 +1,89 @@
+import json
+from typing import List
+from uuid import uuid4
+import redis as redis_sync
+from langchain_core.embeddings import Embeddings
+from app.core.config import settings
+from app.core.logging import logging
+from app.services.redis import redis_client
+
+## Setting up logger
+logger = logging.getLogger(__name__)
+
+EMBEDDING_QUEUE = "embedding_queue"
+EMBEDDING_REPLY_PREFIX = "embedding_reply:"
+
+
+class RemoteEmbeddings(Embeddings):
+    """
+    Thin client for the shared embedding daemon (app/workers/embedding_worker.py).
+
+    A request is pushed to `embedding_queue` as {"id", "texts"}; the daemon answers on the
+    list `embedding_reply:<id>` which we block on. No model is loaded in this process.
+    """
+
+    def __init__(self, queue_name: str = EMBEDDING_QUEUE, timeout: int = 30):
+        self.queue_name = queue_name
+        self.timeout = timeout
+        self._sync_client = None
+
+    def _request(self, texts):
+        request_id = str(uuid4())
+        return EMBEDDING_REPLY_PREFIX + request_id, json.dumps({"id": request_id, "texts": texts})
+
+    def _parse_reply(self, reply, count):
+        if reply is None:
+            raise TimeoutError(f"Embedding daemon did not answer within {self.timeout}s")
+        _, message = reply
+        data = json.loads(message)
+        if data.get("error"):
+            raise RuntimeError(f"Embedding daemon failed: {data['error']}")
+        vectors = data["vectors"]
+        if len(vectors) != count:
+            raise RuntimeError(f"Embedding daemon returned {len(vectors)} vectors for {count} texts")
+        return vectors
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        reply_key, payload = self._request(texts)
+        await redis_client.lpush(self.queue_name, payload)
+        reply = await redis_client.brpop(reply_key, timeout=self.timeout)
+        return self._parse_reply(reply, len(texts))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        if self._sync_client is None:
+            self._sync_client = redis_sync.from_url(settings.REDIS_SERVER_URL, decode_responses=True)
+        reply_key, payload = self._request(texts)
+        self._sync_client.lpush(self.queue_name, payload)
+        reply = self._sync_client.brpop(reply_key, timeout=self.timeout)
+        return self._parse_reply(reply, len(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def load_local_embeddings():
+    """Loads the sentence-transformers model into this process."""
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    return HuggingFaceEmbeddings(
+        model_name=settings.EMBEDDING_MODEL,
+        model_kwargs={'device': 'cpu'}
+    )
+
+
+def build_embeddings() -> Embeddings:
+    """
+    Embeddings for the API, MCP server and workers. With EMBEDDING_BACKEND="remote" every
+    process shares the model held by the embedding daemon instead of loading its own copy.
+    """
+    if settings.EMBEDDING_BACKEND.lower() == "remote":
+        logger.info("Using the shared embedding daemon")
+        return RemoteEmbeddings(timeout=settings.EMBEDDING_REQUEST_TIMEOUT)
+    return load_local_embeddings()
@@ -0,0 +1,98 @@
+import math
+from typing import List
+from app.core.logging import logging
+from app.db.client import mongo_client
+from app.utils.lexical import tokenize
+
+## Setting up logger
+logger = logging.getLogger(__name__)
+
+
+class LexicalIndex:
+    """
+    BM25 over the `lexical` fields written on every child chunk at ingest time.
+
+    The (doc_id, lexical.terms) multikey index is the inverted index: one query fetches
+    every child of the document containing a query term, which also gives the exact
+    document frequencies. Per-document totals (child count, average length) are
+    aggregated once and kept until the document is invalidated.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, max_candidates: int = 5000):
+        self.k1 = k1
+        self.b = b
+        self.max_candidates = max_candidates
+        # doc_id -> (number of children, average child length in terms)
+        self.doc_stats = {}
+
+    def evict(self, doc_id: str):
+        self.doc_stats.pop(doc_id, None)
+
+    async def _stats(self, doc_id):
+        stats = self.doc_stats.get(doc_id)
+        if stats is None:
+            rows = await mongo_client.db.children.aggregate([
+                {"$match": {"doc_id": doc_id, "lexical": {"$exists": True}}},
+                {"$group": {"_id": None, "count": {"$sum": 1}, "length": {"$avg": "$lexical.length"}}}
+            ]).to_list(length=1)
+            stats = (rows[0]["count"], rows[0]["length"] or 1) if rows else (0, 1)
+            if not rows:
+                # Ingested before the lexical fields existed (see app.workers.migrate_lexical)
+                logger.warning(f"doc_id={doc_id} has no lexical fields, hybrid search falls back to vectors only")
+            self.doc_stats[doc_id] = stats
+        return stats
+
+    async def search(self, query: str, doc_id: str, limit: int = 20) -> List[dict]:
+        """Top children by BM25 score: [{"_id", "parent_id", "score"}]."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        child_count, avg_length = await self._stats(doc_id)
+        if not child_count:
+            return []
+
+        cursor = mongo_client.db.children.find(
+            {"doc_id": doc_id, "lexical.terms": {"$in": terms}},
+            {"parent_id": 1, "lexical": 1}
+        ).limit(self.max_candidates)
+        candidates = await cursor.to_list(length=None)
+        if not candidates:
+            logger.info(f"BM25 found no candidates for doc_id={doc_id} terms={terms}")
+            return []
+
+        query_terms = set(terms)
+        frequencies = []
+        document_frequency = dict.fromkeys(terms, 0)
+        for child in candidates:
+            lexical = child["lexical"]
+            matched = {t: tf for t, tf in zip(lexical["terms"], lexical["tf"]) if t in query_terms}
+            for term in matched:
+                document_frequency[term] += 1
+            frequencies.append((child, matched, lexical["length"]))
+
+        idf = {
+            term: math.log(1 + (child_count - df + 0.5) / (df + 0.5))
+            for term, df in document_frequency.items()
+        }
+
+        results = []
+        for child, matched, length in frequencies:
+            norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+            score = sum(idf[t] * tf * (self.k1 + 1) / (tf + norm) for t, tf in matched.items())
+            results.append({"_id": child["_id"], "parent_id": child["parent_id"], "score": score})
+
+        results.sort(key=lambda r: r["score"], reverse=True)
+        return results[:limit]
+
+
+def reciprocal_rank_fusion(rankings: List[List[dict]], weights: List[float], k: int = 60) -> List[tuple]:
+    """
+    Fuses ranked result lists: score(d) = sum over lists of weight / (k + rank of d).
+    Returns [(_id, fused score)] best first.
+    """
+    scores = {}
+    for results, weight in zip(rankings, weights):
+        for rank, result in enumerate(results, start=1):
+            scores[result["_id"]] = scores.get(result["_id"], 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
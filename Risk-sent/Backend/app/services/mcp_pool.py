@@ -0,0 +1,199 @@
+import asyncio
+import time
+import anyio
+from app.core.logging import logging
+from langchain_core.tools import ToolException
+from langchain_mcp_adapters.tools import load_mcp_tools
+
+## Setting up logger
+logger = logging.getLogger(__name__)
+
+# The stream to the child is gone; anything else raised by a call is about the call itself
+TRANSPORT_ERRORS = (anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream, ConnectionError)
+
+
+class MCPSession:
+    """
+    One MCP child process plus its tools and metrics.
+
+    The session context is entered and exited by a single owner task (`_run`), because the
+    stdio client's task group must be closed from the task that opened it.
+    """
+
+    def __init__(self, client, server_name, index):
+        self.client = client
+        self.server_name = server_name
+        self.index = index
+        self.session = None
+        self.tools = {}
+        self.task = None
+        self.ready = None
+        self.closing = None
+        self.healthy = False
+        # Metrics
+        self.in_flight = 0
+        self.calls = 0
+        self.errors = 0
+        self.total_latency_ms = 0.0
+        self.started_at = None
+
+    async def start(self):
+        self.ready = asyncio.get_running_loop().create_future()
+        self.closing = asyncio.Event()
+        self.task = asyncio.create_task(self._run())
+        await self.ready
+        self.started_at = time.time()
+        logger.info(f"MCP session[{self.index}] is up with {len(self.tools)} tools")
+
+    async def _run(self):
+        try:
+            async with self.client.session(self.server_name) as session:
+                self.session = session
+                self.tools = {t.name: t for t in await load_mcp_tools(session)}
+                self.healthy = True
+                self.ready.set_result(True)
+                await self.closing.wait()
+        except Exception as e:
+            logger.error(f"MCP session[{self.index}] failed: {str(e)}")
+            if not self.ready.done():
+                self.ready.set_exception(e)
+        finally:
+            self.healthy = False
+            self.session = None
+
+    @property
+    def alive(self):
+        return self.healthy and self.task is not None and not self.task.done()
+
+    async def ping(self, timeout):
+        await asyncio.wait_for(self.session.send_ping(), timeout=timeout)
+
+    async def call(self, tool_name, arguments):
+        self.in_flight += 1
+        self.calls += 1
+        started = time.perf_counter()
+        try:
+            return await self.tools[tool_name].coroutine(**arguments)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self.total_latency_ms += (time.perf_counter() - started) * 1000
+
+    async def stop(self):
+        if self.closing:
+            self.closing.set()
+        if self.task:
+            await asyncio.gather(self.task, return_exceptions=True)
+
+    def stats(self):
+        return {
+            "index": self.index,
+            "alive": self.alive,
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "errors": self.errors,
+            "avg_latency_ms": round(self.total_latency_ms / self.calls, 2) if self.calls else 0,
+            "started_at": self.started_at
+        }
+
+
+class MCPSessionPool:
+    """
+    N MCP server processes behind one set of tools.
+
+    Every tool call goes to the live session with the fewest calls in flight. A health loop
+    pings each session and replaces the ones that died or stopped answering.
+    """
+
+    def __init__(self, client, server_name, size=1, health_interval=10, ping_timeout=5):
+        self.client = client
+        self.server_name = server_name
+        self.size = size
+        self.health_interval = health_interval
+        self.ping_timeout = ping_timeout
+        self.sessions = []
+        self.restarts = 0
+        self.health_task = None
+
+    async def start(self):
+        for index in range(self.size):
+            session = MCPSession(self.client, self.server_name, index)
+            await session.start()
+            self.sessions.append(session)
+        self.health_task = asyncio.create_task(self._health_loop())
+        logger.info(f"MCP session pool started with {self.size} sessions")
+
+    def _pick(self):
+        candidates = [s for s in self.sessions if s.alive]
+        if not candidates:
+            raise RuntimeError("No live MCP session")
+        return min(candidates, key=lambda s: s.in_flight)
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for i, session in enumerate(self.sessions):
+                try:
+                    if session.alive:
+                        await session.ping(self.ping_timeout)
+                        continue
+                except Exception as e:
+                    logger.error(f"MCP session[{i}] failed its health check: {str(e)}")
+
+                logger.warning(f"MCP session[{i}] is unhealthy, restarting")
+                try:
+                    await session.stop()
+                    replacement = MCPSession(self.client, self.server_name, i)
+                    await replacement.start()
+                    self.sessions[i] = replacement
+                    self.restarts += 1
+                except Exception as e:
+                    logger.error(f"Could not restart MCP session[{i}]: {str(e)}")
+
+    def tools(self):
+        """The servers' tools, each dispatching its calls across the pool."""
+        return [
+            tool.model_copy(update={"coroutine": self._dispatcher(name)})
+            for name, tool in self._pick().tools.items()
+        ]
+
+    async def _session_failed(self, session, error):
+        """Whether `error` came from the session itself rather than from the tool."""
+        if not session.alive or isinstance(error, TRANSPORT_ERRORS):
+            return True
+        try:
+            await session.ping(self.ping_timeout)
+            return False
+        except Exception:
+            return True
+
+    def _dispatcher(self, tool_name):
+        async def call_tool(**arguments):
+            session = self._pick()
+            try:
+                return await session.call(tool_name, arguments)
+            except ToolException:
+                # The tool ran and reported an error: the session is fine and a retry would fail too
+                raise
+            except Exception as e:
+                if len(self.sessions) == 1 or not await self._session_failed(session, e):
+                    raise
+                # The child died under us: mark it for restart and try another one once
+                logger.warning(f"Tool {tool_name} failed on MCP session[{session.index}] ({str(e)}), retrying")
+                session.healthy = False
+                return await self._pick().call(tool_name, arguments)
+        return call_tool
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "restarts": self.restarts,
+            "sessions": [s.stats() for s in self.sessions]
+        }
+
+    async def stop(self):
+        if self.health_task:
+            self.health_task.cancel()
+        await asyncio.gather(*(s.stop() for s in self.sessions), return_exceptions=True)
@@ -0,0 +1,87 @@
+import asyncio
+from app.core.logging import logging
+from app.services.chat_services import get_chat_by_id, set_chat_title_if_empty, update_chat_summary_if_version
+
+## Setting up logger
+logger = logging.getLogger(__name__)
+
+
+class ChatMemoryMaintainer:
+    """
+    Background title generation and rolling summarization for chats.
+
+    run_query schedules work after the answer is streamed; requests for the same chat that
+    are still pending are coalesced into one job, and summaries are written with optimistic
+    concurrency on `summary_version` so two racing turns can't clobber each other.
+    """
+
+    def __init__(self, summarize, titler, workers: int = 2, max_retries: int = 3):
+        # summarize(current_summary, messages) -> str ; titler(user_input, answer) -> str
+        self.summarize = summarize
+        self.titler = titler
+        self.workers = workers
+        self.max_retries = max_retries
+        self.queue = asyncio.Queue()
+        # chat_id -> {"title": (user_input, answer) | None, "summary": bool}
+        self.pending = {}
+        self.tasks = []
+
+    def start(self):
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"Chat memory maintainer started with {self.workers} workers")
+
+    async def stop(self, timeout: float = 10):
+        """Gives queued jobs a chance to finish, then cancels the workers."""
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"{len(self.pending)} chat memory jobs dropped on shutdown")
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    def schedule_title(self, chat_id: str, user_input: str, answer: str):
+        self._job(chat_id)["title"] = (user_input, answer)
+
+    def schedule_summary(self, chat_id: str):
+        self._job(chat_id)["summary"] = True
+
+    def _job(self, chat_id):
+        job = self.pending.get(chat_id)
+        if job is None:
+            job = {"title": None, "summary": False}
+            self.pending[chat_id] = job
+            self.queue.put_nowait(chat_id)
+        return job
+
+    async def _worker(self):
+        while True:
+            chat_id = await self.queue.get()
+            # Everything scheduled for the chat up to now is handled by this one job
+            job = self.pending.pop(chat_id, None)
+            try:
+                if job:
+                    await self._run(chat_id, job)
+            except Exception as e:
+                logger.error(f"Chat memory maintenance failed for chat={chat_id}: {str(e)}")
+            finally:
+                self.queue.task_done()
+
+    async def _run(self, chat_id, job):
+        if job["title"]:
+            user_input, answer = job["title"]
+            title = await self.titler(user_input, answer)
+            # Only the first title wins
+            await set_chat_title_if_empty(chat_id, title)
+
+        if job["summary"]:
+            for _ in range(self.max_retries):
+                chat = await get_chat_by_id(chat_id)
+                if not chat:
+                    return
+                version = chat.get("summary_version", 0)
+                summary = await self.summarize(chat.get("summary") or "", chat["messages"])
+                if await update_chat_summary_if_version(chat_id, summary, version):
+                    return
+                logger.info(f"Summary of chat={chat_id} changed underneath us, retrying")
+            logger.warning(f"Gave up summarizing chat={chat_id} after {self.max_retries} conflicts")
@@ -0,0 +1,87 @@
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import StructuredTool
+from app.core.logging import logging
+from app.services.ai_service import rag_service
+from app.utils.uploads import SearchSchema, PortfolioSearchSchema
+
+## Setting up logger
+logger = logging.getLogger(__name__)
+
+SEMANTIC_SEARCH_DESCRIPTION = "Search for any specific context."
+PORTFOLIO_SEARCH_DESCRIPTION = "Search across all of the user's documents at once (or the given doc_ids), e.g. to compare risks between filings."
+
+
+def format_search_results(retrieved_docs) -> str:
+    """Formats retrieved parent chunks as the "Observation" the LLM reads."""
+    if not retrieved_docs:
+        return "No specific risks found for this query in the documents."
+
+    formatted_results = []
+    for doc in retrieved_docs:
+        page_num = doc.get("page", "Unknown")
+        page_end = doc.get("page_end")
+        content = doc.get("text", "Unknown").strip()
+        # Multi-document results say which filing they come from
+        source = f"{doc['filename']}, " if doc.get("filename") else ""
+        if page_end and page_end != page_num:
+            formatted_results.append(f"--- [SOURCE: {source}PAGES {page_num}-{page_end}] ---\n{content}")
+        else:
+            formatted_results.append(f"--- [SOURCE: {source}PAGE {page_num}] ---\n{content}")
+
+    return "\n\n".join(formatted_results)
+
+
+async def semantic_search(query: str, doc_id: str) -> str:
+    """The semantic_search contract, shared by the MCP server and the in-process tool."""
+    try:
+        if not doc_id :
+            return "**ERROR** : Cannot use this tool"
+        # Returns Parent paragraphs (rich context) for better AI reasoning
+        retrieved_docs = await rag_service.search_risks(query, doc_id)
+        return format_search_results(retrieved_docs)
+    except Exception as e:
+        return f"Error during document retrieval: {str(e)}"
+
+
+async def portfolio_search(query: str, owner_id: str, doc_ids=None) -> str:
+    """The portfolio_search contract: one query over many documents of one owner."""
+    try:
+        if not owner_id :
+            return "**ERROR** : Cannot use this tool"
+        retrieved_docs = await rag_service.search_portfolio(query, owner_id, doc_ids)
+        return format_search_results(retrieved_docs)
+    except Exception as e:
+        return f"Error during document retrieval: {str(e)}"
+
+
+def build_inprocess_search_tool():
+    """
+    semantic_search as a plain LangChain tool calling rag_service directly, for when the
+    retrieval code lives in the API process. doc_id comes from config["configurable"].
+    """
+    async def search(query: str, config: RunnableConfig) -> str:
+        logger.info("The tool is called in process")
+        return await semantic_search(query, config.get("configurable", {}).get("doc_id"))
+
+    return StructuredTool.from_function(
+        func=None,
+        coroutine=search,
+        name="semantic_search",
+        description=SEMANTIC_SEARCH_DESCRIPTION,
+        args_schema=SearchSchema
+    )
+
+
+def build_inprocess_portfolio_tool():
+    """portfolio_search as a plain LangChain tool; owner_id comes from config["configurable"]."""
+    async def search(query: str, config: RunnableConfig, doc_ids=None) -> str:
+        logger.info("The portfolio tool is called in process")
+        return await portfolio_search(query, config.get("configurable", {}).get("owner_id"), doc_ids)
+
+    return StructuredTool.from_function(
+        func=None,
+        coroutine=search,
+        name="portfolio_search",
+        description=PORTFOLIO_SEARCH_DESCRIPTION,
+        args_schema=PortfolioSearchSchema
+    )
@@ -0,0 +1,118 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+from app.core.logging import logging
+
+## Setting up logger
+logger = logging.getLogger(__name__)
+
+
+class CrossEncoderReranker:
+    """
+    Re-scores retrieved parents with a small CPU cross-encoder (query, text) model.
+
+    All pairs go through one batched `predict` on a dedicated thread. If the model is still
+    loading, fails, or misses `timeout_ms`, the retrieval order is returned unchanged, so
+    reranking can only add latency up to its budget. A predict that missed its budget can't be
+    interrupted, so calls fall back immediately until it finishes instead of queueing behind it.
+    Call `preload()` at startup so the first queries don't fall back while the model loads.
+    """
+
+    def __init__(self, model_name: str, timeout_ms: float = 300, batch_size: int = 32):
+        self.model_name = model_name
+        self.timeout = timeout_ms / 1000
+        self.batch_size = batch_size
+        self.model = None
+        self.load_future = None
+        # Executor future of a predict that timed out but is still running on the thread
+        self.stale_predict = None
+        # One thread: predictions are CPU bound and already batched
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reranker")
+        self.reranked = 0
+        self.fallbacks = 0
+        self.skipped_busy = 0
+
+    def _load(self):
+        from sentence_transformers import CrossEncoder
+        return CrossEncoder(self.model_name, device="cpu")
+
+    def preload(self):
+        """Starts loading the model on the reranker thread (no-op if loaded or loading)."""
+        if self.model is not None:
+            return
+        if self.load_future is None or (self.load_future.done() and self.load_future.exception()):
+            self.load_future = self.executor.submit(self._load_model)
+
+    def _load_model(self):
+        started = time.perf_counter()
+        try:
+            self.model = self._load()
+        except Exception as e:
+            logger.error(f"Could not load reranker {self.model_name} {str(e)}")
+            raise
+        logger.info(f"Loaded reranker {self.model_name} in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+    def _ensure_loaded(self):
+        if self.model is None:
+            self.preload()
+        return self.model is not None
+
+    async def rerank(self, query: str, results: List[dict], top_k: int = 5, timeout_ms: float = None) -> Tuple[List[dict], bool]:
+        """
+        Best `top_k` of `results` by cross-encoder score (retrieval score kept as `retrieval_score`),
+        and whether it fell back to the retrieval order. Fallback results should not be cached.
+        `timeout_ms` overrides the budget for this call.
+        """
+        timeout = self.timeout if timeout_ms is None else timeout_ms / 1000
+        # A single result is scored too, so its score is on the same scale as everyone else's
+        if not results:
+            return [], False
+        if not self._ensure_loaded():
+            self.fallbacks += 1
+            return results[:top_k], True
+        if self.stale_predict is not None and not self.stale_predict.done():
+            self.fallbacks += 1
+            self.skipped_busy += 1
+            return results[:top_k], True
+
+        pairs = [(query, r.get("text") or "") for r in results]
+        started = time.perf_counter()
+        predict = asyncio.get_running_loop().run_in_executor(
+            self.executor,
+            lambda: self.model.predict(pairs, batch_size=self.batch_size)
+        )
+        try:
+            # Shielded: the thread keeps running after a timeout, and we need to see when it ends
+            scores = await asyncio.wait_for(asyncio.shield(predict), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.stale_predict = predict
+            # Nobody awaits it any more: retrieve its outcome so errors aren't reported as unhandled
+            predict.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self.fallbacks += 1
+            logger.warning(f"Reranking {len(pairs)} candidates exceeded {timeout * 1000:.0f}ms, keeping retrieval order")
+            return results[:top_k], True
+        except Exception as e:
+            self.fallbacks += 1
+            logger.error(f"Reranking failed, keeping retrieval order {str(e)}")
+            return results[:top_k], True
+
+        self.reranked += 1
+        logger.info(f"Reranked {len(pairs)} candidates in {(time.perf_counter() - started) * 1000:.0f}ms")
+        reranked = []
+        for result, score in zip(results, scores):
+            # Already reranked candidates (e.g. merged across documents) keep their first-stage score
+            result = dict(result, retrieval_score=result.get("retrieval_score", result.get("score")))
+            result["score"] = float(score)
+            reranked.append(result)
+        reranked.sort(key=lambda r: r["score"], reverse=True)
+        return reranked[:top_k], False
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model_name,
+            "loaded": self.model is not None,
+            "reranked": self.reranked,
+            "fallbacks": self.fallbacks,
+            "skipped_busy": self.skipped_busy
+        }
@@ -0,0 +1,192 @@
+import asyncio
+import hashlib
+import json
+import os
+import socket
+import time
+from collections import OrderedDict
+from app.core.logging import logging
+from app.services.embedding_cache import normalize_query
+
+## Setting up logger
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_CACHE_PREFIX = "retrieval:"
+# doc_ids published here are dropped from the cache of every process (API, MCP servers, workers)
+RETRIEVAL_INVALIDATION_CHANNEL = "retrieval_invalidate"
+# Every process reports its retrieval counters under this prefix (see RetrievalCache.report_interval)
+RETRIEVAL_STATS_PREFIX = "retrieval_stats:"
+
+
+async def invalidate_document(redis, doc_id: str):
+    """Drops doc_id from the Redis tier and tells every process to drop it locally."""
+    try:
+        keys = [k async for k in redis.scan_iter(match=f"{RETRIEVAL_CACHE_PREFIX}{doc_id}:*")]
+        if keys:
+            await redis.delete(*keys)
+        await redis.publish(RETRIEVAL_INVALIDATION_CHANNEL, doc_id)
+    except Exception as e:
+        logger.error(f"Error invalidating the retrieval cache of doc_id={doc_id} {str(e)}")
+
+
+async def collect_stats(redis) -> dict:
+    """Latest counters reported by every live process (API, MCP servers), keyed by process."""
+    keys = [k async for k in redis.scan_iter(match=f"{RETRIEVAL_STATS_PREFIX}*")]
+    if not keys:
+        return {}
+    values = await redis.mget(keys)
+    return {
+        key[len(RETRIEVAL_STATS_PREFIX):]: json.loads(value)
+        for key, value in zip(keys, values)
+        if value is not None
+    }
+
+
+class RetrievalCache:
+    """
+    search_risks results keyed by (doc_id, normalized query, limit).
+
+    An in-process LRU with a TTL, optionally backed by a shared Redis tier (`shared=True`)
+    so MCP server processes benefit from each other's lookups. Invalidations arrive over
+    Redis pub/sub, so a worker finishing or restarting a document clears every process.
+
+    With `report_interval`, the process also writes `stats_source()` (default: the cache's own
+    stats) to Redis every that many seconds, so `collect_stats` sees every process.
+    """
+
+    def __init__(self, max_size: int = 512, ttl: float = 300, redis=None, shared: bool = False, on_invalidate=None,
+                 namespace: str = "", stats_source=None, report_interval: float = 0):
+        self.max_size = max_size
+        # Part of every key, so results of different retrieval modes never mix
+        self.namespace = namespace
+        self.ttl = ttl
+        self.redis = redis
+        self.shared = shared and redis is not None
+        # Called with the doc_id on every invalidation (e.g. to evict FAISS partitions)
+        self.on_invalidate = on_invalidate
+
+        # (doc_id, key) -> (expires_at, results)
+        self.cache: OrderedDict[tuple, tuple] = OrderedDict()
+        # Bumped on invalidation so a search that started before it can't repopulate stale results
+        self.generations = {}
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.listener_task = None
+        self.stats_source = stats_source or self.stats
+        self.report_interval = report_interval
+        self.process = f"{socket.gethostname()}:{os.getpid()}"
+        self.report_task = None
+
+    def _key(self, query, limit):
+        return hashlib.sha1(f"{self.namespace}:{limit}:{normalize_query(query)}".encode("utf-8")).hexdigest()
+
+    def generation(self, doc_id):
+        return self.generations.get(doc_id, 0)
+
+    async def get(self, doc_id: str, query: str, limit: int = 5):
+        self.ensure_listener()
+        key = self._key(query, limit)
+
+        entry = self.cache.get((doc_id, key))
+        if entry is not None:
+            expires_at, results = entry
+            if expires_at > time.monotonic():
+                self.cache.move_to_end((doc_id, key))
+                self.hits += 1
+                return [dict(r) for r in results]
+            self.cache.pop((doc_id, key), None)
+
+        if self.shared:
+            try:
+                raw = await self.redis.get(f"{RETRIEVAL_CACHE_PREFIX}{doc_id}:{key}")
+                if raw is not None:
+                    results = json.loads(raw)
+                    self._put_local(doc_id, key, results)
+                    self.redis_hits += 1
+                    return [dict(r) for r in results]
+            except Exception as e:
+                logger.error(f"Error reading the retrieval cache from redis {str(e)}")
+
+        self.misses += 1
+        return None
+
+    async def put(self, doc_id: str, query: str, results, limit: int = 5, generation: int = None):
+        if generation is not None and generation != self.generation(doc_id):
+            return
+        key = self._key(query, limit)
+        # _id may be an ObjectId; the cached copy only needs it as a string
+        results = json.loads(json.dumps(results, default=str))
+        self._put_local(doc_id, key, results)
+
+        if self.shared:
+            try:
+                await self.redis.set(f"{RETRIEVAL_CACHE_PREFIX}{doc_id}:{key}", json.dumps(results), ex=int(self.ttl))
+            except Exception as e:
+                logger.error(f"Error writing the retrieval cache to redis {str(e)}")
+
+    def _put_local(self, doc_id, key, results):
+        self.cache[(doc_id, key)] = (time.monotonic() + self.ttl, results)
+        self.cache.move_to_end((doc_id, key))
+        while len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+
+    def drop(self, doc_id: str):
+        """Local part of an invalidation."""
+        self.generations[doc_id] = self.generation(doc_id) + 1
+        for cache_key in [k for k in self.cache if k[0] == doc_id]:
+            self.cache.pop(cache_key, None)
+        if self.on_invalidate:
+            self.on_invalidate(doc_id)
+
+    async def invalidate(self, doc_id: str):
+        """Drops doc_id from this process, the Redis tier, and every subscribed process."""
+        self.drop(doc_id)
+        if self.redis is not None:
+            await invalidate_document(self.redis, doc_id)
+
+    def ensure_listener(self):
+        """Subscribes to invalidations (and starts reporting stats) the first time the cache is used in a running loop."""
+        if self.redis is None:
+            return
+        if self.report_interval and (self.report_task is None or self.report_task.done()):
+            self.report_task = asyncio.create_task(self._report())
+        if self.listener_task is not None and not self.listener_task.done():
+            return
+        self.listener_task = asyncio.create_task(self._listen())
+
+    async def _report(self):
+        # Expires a few intervals after the process stops reporting
+        expiry = max(int(self.report_interval * 3), 1)
+        while True:
+            try:
+                await self.redis.set(f"{RETRIEVAL_STATS_PREFIX}{self.process}", json.dumps(self.stats_source()), ex=expiry)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error reporting retrieval stats to redis {str(e)}")
+            await asyncio.sleep(self.report_interval)
+
+    async def _listen(self):
+        pubsub = self.redis.pubsub()
+        try:
+            await pubsub.subscribe(RETRIEVAL_INVALIDATION_CHANNEL)
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    self.drop(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Retrieval cache invalidation listener stopped {str(e)}")
+        finally:
+            await pubsub.aclose()
+
+    def stats(self) -> dict:
+        total = self.hits + self.redis_hits + self.misses
+        return {
+            "size": len(self.cache),
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.redis_hits) / total, 4) if total else 0.0
+        }
@@ -0,0 +1,229 @@
+import asyncio
+from collections import OrderedDict
+from typing import List
+import numpy as np
+from bson import ObjectId
+from app.core.config import settings
+from app.core.logging import logging
+from app.db.client import mongo_client
+from app.utils.vector_codec import decode_embeddings, encode_query_vector
+
+## Setting up logger
+logger = logging.getLogger(__name__)
+
+
+class VectorStore:
+    """Base class for the child-embedding search backends used by RiskSentAIService."""
+
+    async def search(self, query_vector: List[float], doc_id: str, limit: int = 5) -> List[dict]:
+        """Returns the top `limit` hits as {"_id", "text", "page", "score"} dicts."""
+        raise NotImplementedError
+
+    def evict(self, doc_id: str):
+        """Drops any in-memory state held for the document."""
+        pass
+
+
+class AtlasVectorStore(VectorStore):
+    """MongoDB Atlas `$vectorSearch` over the children collection."""
+
+    def __init__(self, index_name: str = "vector_index", num_candidates: int = 100):
+        self.index_name = index_name
+        self.num_candidates = num_candidates
+
+    async def search(self, query_vector, doc_id, limit=5):
+        pipeline = [
+            {
+                "$vectorSearch": {
+                    "index": self.index_name,
+                    "path": "embedding",
+                    "queryVector": encode_query_vector(query_vector, settings.EMBEDDING_STORAGE),
+                    "numCandidates": self.num_candidates,
+                    "limit": limit,
+                    "filter": {
+                        "$and": [
+                            {"doc_id": doc_id}
+                        ]
+                    }
+                }
+            },
+            {
+                # Join with Parents to get the full context
+                "$lookup": {
+                    "from": "parents",
+                    "localField": "parent_id",
+                    "foreignField": "_id",
+                    "as": "parent_context"
+                }
+            },
+            { "$unwind": "$parent_context" },
+            {
+                "$project": {
+                    "parent_id": 1,
+                    "text": "$parent_context.text",
+                    "page": "$parent_context.metadata.page",
+                    "page_end": "$parent_context.metadata.page_end",
+                    "score": {"$meta": "vectorSearchScore"}
+                }
+            }
+        ]
+
+        cursor = mongo_client.db.children.aggregate(pipeline)
+        return await cursor.to_list(length=limit)
+
+
+class FaissPartition:
+    """In-memory HNSW index over the children of a single document."""
+
+    def __init__(self, index, child_ids, parent_ids, parents):
+        self.index = index
+        self.child_ids = child_ids
+        self.parent_ids = parent_ids
+        # parent_id -> (text, page, page_end), so a search never has to go back to Mongo
+        self.parents = parents
+
+    def __len__(self):
+        return len(self.child_ids)
+
+
+class FaissVectorStore(VectorStore):
+    """
+    Local ANN backend. Each doc_id gets its own HNSW partition, built lazily from
+    the children/parents collections on first search and kept in an LRU of partitions.
+    """
+
+    def __init__(self, hnsw_m: int = 32, ef_search: int = 64, max_partitions: int = 32):
+        self.hnsw_m = hnsw_m
+        self.ef_search = ef_search
+        self.max_partitions = max_partitions
+        self.partitions: OrderedDict[str, FaissPartition] = OrderedDict()
+        self.locks: dict[str, asyncio.Lock] = {}
+
+    async def search(self, query_vector, doc_id, limit=5):
+        partition = await self._get_partition(doc_id)
+        if partition is None or len(partition) == 0:
+            return []
+
+        query = np.asarray([query_vector], dtype=np.float32)
+        self._normalize(query)
+        scores, positions = partition.index.search(query, min(limit, len(partition)))
+
+        results = []
+        for score, pos in zip(scores[0], positions[0]):
+            if pos < 0:
+                continue
+            text, page, page_end = partition.parents.get(partition.parent_ids[pos], (None, None, None))
+            if text is None:
+                continue
+            results.append({
+                "_id": partition.child_ids[pos],
+                "parent_id": partition.parent_ids[pos],
+                "text": text,
+                "page": page,
+                "page_end": page_end,
+                # Same scale as Atlas' cosine vectorSearchScore
+                "score": float((1 + score) / 2)
+            })
+        return results
+
+    def evict(self, doc_id):
+        if self.partitions.pop(doc_id, None) is not None:
+            logger.info(f"Evicted FAISS partition for doc_id={doc_id}")
+
+    async def _get_partition(self, doc_id):
+        partition = self.partitions.get(doc_id)
+        if partition is not None:
+            self.partitions.move_to_end(doc_id)
+            return partition
+
+        lock = self.locks.setdefault(doc_id, asyncio.Lock())
+        async with lock:
+            # Another request may have built it while we were waiting
+            partition = self.partitions.get(doc_id)
+            if partition is not None:
+                return partition
+
+            partition, cacheable = await self._load_partition(doc_id)
+            if cacheable:
+                self.partitions[doc_id] = partition
+                while len(self.partitions) > self.max_partitions:
+                    evicted, _ = self.partitions.popitem(last=False)
+                    logger.info(f"FAISS partition LRU full, evicted doc_id={evicted}")
+        self.locks.pop(doc_id, None)
+        return partition
+
+    async def _load_partition(self, doc_id):
+        db = mongo_client.db
+        children = await db.children.find(
+            {"doc_id": doc_id},
+            {"embedding": 1, "embedding_scale": 1, "parent_id": 1}
+        ).to_list(length=None)
+        parents = await db.parents.find(
+            {"doc_id": doc_id},
+            {"text": 1, "metadata.page": 1, "metadata.page_end": 1}
+        ).to_list(length=None)
+
+        # Only keep partitions of fully ingested documents, otherwise we'd serve a stale index.
+        # Deduplicated uploads only point at processed chunks, and outlive a deleted source
+        document = await db.document.find_one(
+            {
+                "status": "processed",
+                "$or": [{"_id": ObjectId(doc_id)}, {"source_doc_id": doc_id}]
+            },
+            {"_id": 1}
+        )
+        cacheable = document is not None
+
+        loop = asyncio.get_running_loop()
+        partition = await loop.run_in_executor(None, self._build_partition, children, parents)
+        logger.info(f"Built FAISS partition for doc_id={doc_id} with {len(partition)} vectors")
+        return partition, cacheable
+
+    def _build_partition(self, children, parents):
+        import faiss
+
+        parent_map = {
+            p["_id"]: (p["text"], p.get("metadata", {}).get("page"), p.get("metadata", {}).get("page_end"))
+            for p in parents
+        }
+        children = [c for c in children if c.get("embedding") is not None]
+        if not children:
+            return FaissPartition(None, [], [], parent_map)
+
+        # Handles float arrays as well as float16/int8 binaries (EMBEDDING_STORAGE)
+        vectors = decode_embeddings(children)
+        self._normalize(vectors)
+
+        index = faiss.IndexHNSWFlat(vectors.shape[1], self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efSearch = self.ef_search
+        index.add(vectors)
+
+        return FaissPartition(
+            index,
+            [c["_id"] for c in children],
+            [c["parent_id"] for c in children],
+            parent_map
+        )
+
+    @staticmethod
+    def _normalize(vectors):
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        vectors /= norms
+
+
+def build_vector_store() -> VectorStore:
+    """Picks the search backend from settings.VECTOR_STORE_BACKEND ("atlas" or "faiss")."""
+    backend = settings.VECTOR_STORE_BACKEND.lower()
+    if backend == "faiss":
+        return FaissVectorStore(
+            hnsw_m=settings.FAISS_HNSW_M,
+            ef_search=settings.FAISS_EF_SEARCH,
+            max_partitions=settings.FAISS_MAX_PARTITIONS
+        )
+    if backend != "atlas":
+        logger.warning(f"Unknown VECTOR_STORE_BACKEND={backend}, falling back to atlas")
+    if settings.EMBEDDING_STORAGE == "float16":
+        # Atlas only indexes float32 arrays and int8/float32/bit BSON vectors: fail now, not on every search
+        raise ValueError("EMBEDDING_STORAGE=float16 is not searchable by Atlas, use int8 or the faiss backend")
+    return AtlasVectorStore()
@@ -0,0 +1,275 @@
+import re
+from bisect import bisect_right
+from typing import List
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_text_splitters.character import _split_text_with_regex
+
+
+def locate_chunks(text: str, chunks: List[str], chunk_overlap: int = 0) -> List[int]:
+    """
+    Start offset of every chunk in `text`. Chunks come in order and overlap by at most
+    `chunk_overlap`, so each search starts where the previous chunk's overlap can begin
+    (as `add_start_index` does); searching from just past the previous start would match
+    too early on repetitive text.
+    """
+    offsets = []
+    previous_start = 0
+    previous_len = 0
+    for chunk in chunks:
+        # Never before the previous chunk, whatever the overlap
+        cursor = max(previous_start + previous_len - chunk_overlap, previous_start)
+        start = text.find(chunk, cursor)
+        if start < 0:
+            # The splitter stripped something we can't match exactly, keep the best guess
+            start = min(cursor, len(text))
+        offsets.append(start)
+        previous_start, previous_len = start, len(chunk)
+    return offsets
+
+
+def page_span(page_breaks: List[list], start: int, end: int):
+    """(first page, last page) of the [start, end) range, given [page, offset] breaks sorted by offset."""
+    offsets = [offset for _, offset in page_breaks]
+    first = page_breaks[max(bisect_right(offsets, start) - 1, 0)][0]
+    last = page_breaks[max(bisect_right(offsets, max(end - 1, start)) - 1, 0)][0]
+    return first, last
+
+
+def child_chunks_metadata(parent_metadata: dict, parent_text: str, child_texts: List[str], chunk_overlap: int = 0) -> List[dict]:
+    """Page span and character offsets (in the whole document) of each child of a parent."""
+    page_breaks = parent_metadata.get("page_breaks")
+    if not page_breaks:
+        return [{} for _ in child_texts]
+
+    base = parent_metadata.get("char_start", 0)
+    metadata = []
+    for child, start in zip(child_texts, locate_chunks(parent_text, child_texts, chunk_overlap)):
+        end = start + len(child)
+        page_start, page_end = page_span(page_breaks, start, end)
+        metadata.append({
+            "page": page_start,
+            "page_start": page_start,
+            "page_end": page_end,
+            "char_start": base + start,
+            "char_end": base + end
+        })
+    return metadata
+
+
+class StreamingSplitter:
+    """
+    Runs a RecursiveCharacterTextSplitter over text that arrives in pieces (pages).
+
+    Only the text before the buffer's last top-level split (which the next page may extend)
+    is split. Its chunks except the last one are final and emitted right away; the buffer then
+    restarts at the split where the last chunk begins, which already carries the overlap of the
+    chunk before it, so the output matches `split_text` over the whole document (except around
+    a single split longer than `max_buffer`, which is cut early to bound memory).
+
+    Each emitted Document carries where it came from: `page`/`page_start`, `page_end`,
+    `char_start`/`char_end` in the concatenated document text, and `page_breaks`, the
+    [page, offset within the chunk] pairs needed to place its child chunks on pages.
+    """
+
+    def __init__(self, splitter: RecursiveCharacterTextSplitter, metadata: dict, max_buffer: int = None):
+        self.splitter = splitter
+        self.metadata = metadata
+        self.chunk_size = splitter._chunk_size
+        self.chunk_overlap = splitter._chunk_overlap
+        # A single split longer than this (no separator for pages) is cut approximately
+        self.max_buffer = max_buffer or self.chunk_size * 50
+        # Index in splitter._separators of the document's top-level separator
+        self.separator_index = len(splitter._separators) - 1
+        self.buffer = ""
+        # Offset of buffer[0] in the whole document
+        self.buffer_start = 0
+        # Global [page, offset] pairs, one per fed page
+        self.page_starts = []
+
+    def feed(self, text: str, page_number: int = None) -> List[Document]:
+        if page_number is not None:
+            self.page_starts.append([page_number, self.buffer_start + len(self.buffer)])
+        self.buffer += text
+        documents = self._update_separator()
+        # Not enough to be sure the first chunk is final yet
+        if len(self.buffer) < self.chunk_size * 2:
+            return documents
+        return documents + self._emit_final()
+
+    def _emit_final(self) -> List[Document]:
+        """Emits the chunks of the buffer that no later page can change."""
+        # The last top-level split may still grow with the next page, so only the text before
+        # it is split
+        split_starts = self._split_starts(self.buffer)
+        if len(split_starts) < 2:
+            if len(self.buffer) > self.max_buffer:
+                return self._force_emit()
+            return []
+        settled_end = split_starts[-1]
+        settled = self.buffer[:settled_end]
+        chunks = self.splitter.split_text(settled)
+        if not chunks:
+            return []
+        offsets = locate_chunks(settled, chunks, self.chunk_overlap)
+
+        # Splits at least chunk_size long are recursed into on their own; nothing overlaps them
+        ends = split_starts[1:]
+        big = [i for i, (start, end) in enumerate(zip(split_starts, ends)) if self._length(start, end) >= self.chunk_size]
+        if big and big[-1] == len(ends) - 1:
+            # Settled text ends with such a split, so all of it is final
+            emitted = len(chunks)
+            restart = settled_end
+        else:
+            # Restart at the split where the last chunk of the trailing group of small splits
+            # begins; re-merging from there reproduces that chunk, overlap included
+            group = split_starts[big[-1] + 1 if big else 0:]
+            lengths = [self._length(start, end) for start, end in zip(group, group[1:])]
+            restart = group[self._last_chunk_start(lengths)]
+            emitted = len(chunks) - len(self.splitter.split_text(self.buffer[restart:settled_end]))
+        if restart <= 0:
+            return []
+        return self._advance(chunks[:emitted], offsets[:emitted], restart)
+
+    def _last_chunk_start(self, lengths: List[int]) -> int:
+        """Index of the first split of the last chunk `_merge_splits` makes out of splits of `lengths`."""
+        separator_len = 0 if self.splitter._keep_separator else self.splitter._length_function(
+            self.splitter._separators[self.separator_index]
+        )
+        current = []
+        total = 0
+        for index, length in enumerate(lengths):
+            if current and total + length + separator_len > self.chunk_size:
+                while total > self.chunk_overlap or (
+                    total + length + (separator_len if current else 0) > self.chunk_size and total > 0
+                ):
+                    total -= lengths[current[0]] + (separator_len if len(current) > 1 else 0)
+                    current = current[1:]
+            current.append(index)
+            total += length + (separator_len if len(current) > 1 else 0)
+        return current[0] if current else 0
+
+    def _length(self, start: int, end: int) -> int:
+        return self.splitter._length_function(self.buffer[start:end])
+
+    def _force_emit(self) -> List[Document]:
+        """
+        One split longer than `max_buffer`: emit all but its last chunk and restart there.
+        Chunks around the restart may differ slightly from `split_text`, but memory stays bounded.
+        """
+        chunks = self.splitter.split_text(self.buffer)
+        if len(chunks) < 2:
+            return []
+        offsets = locate_chunks(self.buffer, chunks, self.chunk_overlap)
+        if offsets[-1] <= 0:
+            return []
+        return self._advance(chunks[:-1], offsets[:-1], offsets[-1])
+
+    def _advance(self, chunks, offsets, restart) -> List[Document]:
+        documents = self._documents(chunks, offsets)
+        self.buffer = self.buffer[restart:]
+        self.buffer_start += restart
+        return documents
+
+    def _update_separator(self) -> List[Document]:
+        """
+        Tracks the separator split_text would pick for the whole document: the first one present
+        anywhere in it so far (a window of the text may lack it).
+
+        When a better separator shows up for the first time, the text before it is the first
+        split at that level, which the splitter recursed into on its own, so the buffer up to it
+        is final. Separators in between may nest further splits, each of them final as well.
+        """
+        previous = self.separator_index
+        first = {}
+        for index in range(previous):
+            match = self._search(index, self.buffer)
+            if match is not None:
+                first[index] = match.start()
+        if not first:
+            return []
+
+        best = min(first)
+        self.separator_index = best
+        if self.buffer_start == 0:
+            # Nothing emitted yet: the whole buffer is simply split with the new separator
+            return []
+
+        # Ends of the nested first splits, outermost first
+        ends = [first[best]]
+        level = best
+        while True:
+            inner = [index for index in first if level < index and first[index] < ends[-1]]
+            if not inner:
+                break
+            level = min(inner)
+            ends.append(first[level])
+
+        documents = []
+        start = 0
+        for end in reversed(ends):
+            if end > start:
+                piece = self.buffer[start:end]
+                chunks = self.splitter.split_text(piece)
+                offsets = [start + offset for offset in locate_chunks(piece, chunks, self.chunk_overlap)]
+                documents.extend(self._documents(chunks, offsets))
+            start = end
+        self.buffer = self.buffer[start:]
+        self.buffer_start += start
+        return documents
+
+    def _search(self, index: int, text: str):
+        separator = self.splitter._separators[index]
+        if not separator:
+            return re.search("", text)
+        pattern = separator if self.splitter._is_separator_regex else re.escape(separator)
+        return re.search(pattern, text)
+
+    def _split_starts(self, text: str) -> List[int]:
+        """Offsets of the top-level splits RecursiveCharacterTextSplitter makes in the document."""
+        separator = self.splitter._separators[self.separator_index]
+        pattern = separator if self.splitter._is_separator_regex else re.escape(separator)
+
+        starts = []
+        cursor = 0
+        for split in _split_text_with_regex(text, pattern, keep_separator=self.splitter._keep_separator):
+            start = text.find(split, cursor)
+            if start < 0:
+                break
+            starts.append(start)
+            cursor = start + len(split)
+        return starts
+
+    def flush(self) -> List[Document]:
+        chunks = self.splitter.split_text(self.buffer) if self.buffer.strip() else []
+        documents = self._documents(chunks, locate_chunks(self.buffer, chunks, self.chunk_overlap))
+        self.buffer_start += len(self.buffer)
+        self.buffer = ""
+        return documents
+
+    def _documents(self, chunks, offsets):
+        documents = []
+        for chunk, offset in zip(chunks, offsets):
+            metadata = dict(self.metadata)
+            if self.page_starts:
+                char_start = self.buffer_start + offset
+                char_end = char_start + len(chunk)
+                page_start, page_end = page_span(self.page_starts, char_start, char_end)
+                metadata.update({
+                    "page": page_start,
+                    "page_start": page_start,
+                    "page_end": page_end,
+                    "char_start": char_start,
+                    "char_end": char_end,
+                    "page_breaks": [
+                        [page, max(start - char_start, 0)]
+                        for page, start in self.page_starts
+                        if page_start <= page <= page_end
+                    ]
+                })
+            documents.append(Document(page_content=chunk, metadata=metadata))
+
+        # Pages that ended before the buffer are no longer needed
+        while len(self.page_starts) > 1 and self.page_starts[1][1] <= self.buffer_start:
+            self.page_starts.pop(0)
+        return documents
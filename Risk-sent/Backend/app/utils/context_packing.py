@@ -0,0 +1,49 @@
+from typing import List
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count (~4 characters per token for English prose)."""
+    return (len(text) + 3) // 4
+
+
+def group_by_parent(results: List[dict]) -> List[dict]:
+    """
+    One entry per parent chunk: children sharing a parent all return the same parent text.
+    The group keeps its best child's fields and score, plus how many children matched.
+    """
+    groups = {}
+    for result in results:
+        key = result.get("parent_id") or result.get("text")
+        group = groups.get(key)
+        if group is None:
+            groups[key] = dict(result, matched_children=result.get("matched_children", 1))
+            continue
+        group["matched_children"] += result.get("matched_children", 1)
+        if result.get("score", 0) > group.get("score", 0):
+            group.update({k: v for k, v in result.items() if k != "matched_children"})
+    return sorted(groups.values(), key=lambda g: g.get("score", 0), reverse=True)
+
+
+def pack_context(results: List[dict], token_budget: int):
+    """
+    Groups `results` by parent and keeps the best parents that fit in `token_budget`.
+    The best parent is always kept, truncated if it alone is over budget.
+    Returns (packed results, tokens before, tokens after).
+    """
+    tokens_before = sum(estimate_tokens(r.get("text") or "") for r in results)
+
+    packed = []
+    used = 0
+    for group in group_by_parent(results):
+        if group.get("parent_id") is not None:
+            group["parent_id"] = str(group["parent_id"])
+        tokens = estimate_tokens(group.get("text") or "")
+        if used + tokens > token_budget:
+            if packed:
+                # A smaller parent further down may still fit
+                continue
+            group["text"] = group["text"][: token_budget * 4]
+            tokens = token_budget
+        packed.append(group)
+        used += tokens
+    return packed, tokens_before, used
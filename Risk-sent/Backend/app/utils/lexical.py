@@ -0,0 +1,36 @@
+import re
+from collections import Counter
+from typing import List
+
+# Keeps financial tokens whole: "1a", "$1.2", "10-k", "3.5%", "libor"
+TOKEN_PATTERN = re.compile(r"\$?[a-z0-9]+(?:[.,'%-][a-z0-9%]+)*%?")
+
+STOPWORDS = frozenset("""
+a an and are as at be been but by for from has have in into is it its of on or our that the their
+there these this to was we were which will with
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms of `text` for BM25, stopwords removed, thousands separators dropped."""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        token = token.replace(",", "")
+        if token.endswith("'s"):
+            token = token[:-2]
+        if token and token not in STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+
+def lexical_fields(text: str) -> dict:
+    """
+    What a child chunk stores for the inverted index: its distinct terms (multikey-indexed
+    together with doc_id), the matching term frequencies, and its length in terms.
+    """
+    counts = Counter(tokenize(text))
+    return {
+        "terms": list(counts.keys()),
+        "tf": list(counts.values()),
+        "length": sum(counts.values())
+    }
@@ -1,7 +1,12 @@
+import hashlib
+import os
 from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
 import pdfplumber
 from langchain_core.tools import StructuredTool
+from langchain_core.runnables import RunnableConfig
 from pydantic import BaseModel, Field
+from typing import List, Optional
 
 def extract_text_from_pdf(file_path: str) -> str:
     text = []
@@ -14,14 +19,61 @@ def extract_text_from_pdf(file_path: str) -> str:
 
     return "\n".join(text)
 
+def extract_pages_from_pdf(file_path: str) -> list[str]:
+    """One string per page (empty pages included, so index + 1 is the page number)."""
+    with pdfplumber.open(file_path) as pdf:
+        return [(page.extract_text() or "") + "\n" for page in pdf.pages]
+
+class UploadTooLarge(Exception):
+    pass
+
+class NotAPdf(Exception):
+    pass
+
+async def save_upload_stream(file: UploadFile, path, max_bytes: int, chunk_size: int = 1024 * 1024):
+    """
+    Copies the upload to `path` chunk by chunk, so memory stays at one chunk whatever the file size.
+    Returns (size in bytes, sha256 hex). The file only appears at `path` once it is complete.
+    """
+    part_path = f"{path}.part"
+    hasher = hashlib.sha256()
+    size = 0
+    out = await run_in_threadpool(open, part_path, "wb")
+    try:
+        while True:
+            chunk = await file.read(chunk_size)
+            if not chunk:
+                break
+            if size == 0 and not chunk.startswith(b"%PDF-"):
+                raise NotAPdf()
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge()
+            hasher.update(chunk)
+            await run_in_threadpool(out.write, chunk)
+    except BaseException:
+        await run_in_threadpool(out.close)
+        await run_in_threadpool(os.remove, part_path)
+        raise
+    await run_in_threadpool(out.close)
+    await run_in_threadpool(os.replace, part_path, path)
+    return size, hasher.hexdigest()
+
 class SearchSchema(BaseModel):
     query: str = Field(description="The search terms for the 10-K")
 
-def wrap_tool_with_context(tool, doc_id: str):
-    """Wraps an MCP tool to inject doc_id automatically."""
-    async def wrapped_func(*args, **kwargs):
+class PortfolioSearchSchema(BaseModel):
+    query: str = Field(description="The search terms, run against every 10-K of the user")
+    doc_ids: Optional[List[str]] = Field(default=None, description="Restrict the search to these document ids (all documents when omitted)")
+
+def wrap_tool_with_context(tool, key: str = "doc_id", args_schema=SearchSchema):
+    """
+    Wraps an MCP tool so `key` is read from the run's config (config["configurable"][key])
+    instead of being baked in, letting one compiled agent serve every document.
+    """
+    async def wrapped_func(config: RunnableConfig, **kwargs):
         # Inject the doc_id into the arguments before calling the real tool
-        kwargs["doc_id"] = doc_id
+        kwargs[key] = config.get("configurable", {}).get(key)
         return await tool.ainvoke(kwargs)
 
     return StructuredTool.from_function(
@@ -29,5 +81,5 @@ def wrap_tool_with_context(tool, doc_id: str):
         coroutine=wrapped_func,
         name=tool.name,
         description=tool.description,
-        args_schema=SearchSchema # Keeps the original schema (minus doc_id if you prefer)
-    )
\ No newline at end of file
+        args_schema=args_schema # The original schema minus the injected key
+    )
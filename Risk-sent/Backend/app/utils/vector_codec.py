@@ -0,0 +1,60 @@
+from typing import List
+import numpy as np
+from bson.binary import Binary
+
+# BSON binary vector (subtype 9) header: dtype byte, padding byte
+BSON_VECTOR_SUBTYPE = 9
+BSON_VECTOR_INT8 = 0x03
+# float16 has no BSON vector dtype; stored as user-defined binary
+FLOAT16_SUBTYPE = 0x80
+
+
+def encode_embedding(vector, storage: str = "float32") -> dict:
+    """
+    Child-record fields for `vector` in the given storage format:
+    - "float32": a plain array of doubles (what Atlas indexed originally)
+    - "float16": half-precision binary, half the size of float32 and no scale needed
+    - "int8": BSON int8 vector (Atlas-indexable) plus `embedding_scale`, a quarter of float32
+    """
+    if storage == "float32":
+        return {"embedding": [float(x) for x in vector]}
+
+    array = np.asarray(vector, dtype=np.float32)
+    if storage == "float16":
+        return {"embedding": Binary(array.astype(np.float16).tobytes(), FLOAT16_SUBTYPE)}
+    if storage == "int8":
+        # Symmetric per-vector quantization; the scale cancels out under cosine similarity
+        peak = float(np.abs(array).max()) or 1.0
+        scale = peak / 127
+        quantized = np.clip(np.rint(array / scale), -127, 127).astype(np.int8)
+        return {
+            "embedding": Binary(bytes([BSON_VECTOR_INT8, 0]) + quantized.tobytes(), BSON_VECTOR_SUBTYPE),
+            "embedding_scale": scale
+        }
+    raise ValueError(f"Unknown embedding storage {storage}")
+
+
+def decode_embedding(embedding, scale: float = None) -> np.ndarray:
+    """float32 vector from any storage format. Binary payloads are viewed in place (np.frombuffer)."""
+    if isinstance(embedding, Binary):
+        if embedding.subtype == BSON_VECTOR_SUBTYPE:
+            if embedding[0] != BSON_VECTOR_INT8:
+                raise ValueError(f"Unsupported BSON vector dtype {embedding[0]}")
+            vector = np.frombuffer(embedding, dtype=np.int8, offset=2).astype(np.float32)
+            return vector * scale if scale else vector
+        if embedding.subtype == FLOAT16_SUBTYPE:
+            return np.frombuffer(embedding, dtype=np.float16).astype(np.float32)
+        raise ValueError(f"Unsupported embedding binary subtype {embedding.subtype}")
+    return np.asarray(embedding, dtype=np.float32)
+
+
+def decode_embeddings(children: List[dict]) -> np.ndarray:
+    """(n, dim) float32 matrix from child records holding `embedding` (+ `embedding_scale`)."""
+    return np.stack([decode_embedding(c["embedding"], c.get("embedding_scale")) for c in children])
+
+
+def encode_query_vector(vector, storage: str = "float32"):
+    """Atlas wants the query vector in the indexed type: an int8 index gets an int8 query."""
+    if storage == "int8":
+        return encode_embedding(vector, "int8")["embedding"]
+    return vector
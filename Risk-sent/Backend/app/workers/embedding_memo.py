@@ -0,0 +1,67 @@
+from typing import List
+from pymongo.errors import BulkWriteError
+from app.core.logging import logging
+from app.utils.hash import text_hash
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkEmbeddingMemo:
+    """
+    Content-addressed embedding memo in front of the upload worker's embedder.
+
+    Every chunk text is keyed by model + sha256 in the `chunk_embeddings` collection, so
+    boilerplate paragraphs repeated across filings (and repeats inside one batch) are only
+    embedded once. Same `aembed_documents` interface as the embedder it wraps.
+    """
+
+    def __init__(self, db, embedder, model_name: str):
+        self.collection = db.chunk_embeddings
+        self.embedder = embedder
+        self.model_name = model_name
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, text):
+        return f"{self.model_name}:{text_hash(text)}"
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+
+        keys = [self._key(text) for text in texts]
+        cursor = self.collection.find({"_id": {"$in": list(set(keys))}}, {"embedding": 1})
+        known = {doc["_id"]: doc["embedding"] for doc in await cursor.to_list(length=None)}
+
+        # Embed each unknown text once, even if it repeats inside the batch
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in known and key not in missing:
+                missing[key] = text
+
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            vectors = await self.embedder.aembed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            known.update(fresh)
+            try:
+                await self.collection.insert_many(
+                    [{"_id": key, "embedding": vector} for key, vector in fresh.items()],
+                    ordered=False
+                )
+            except BulkWriteError:
+                # Another worker memoized some of the same chunks first
+                pass
+
+        logger.info(f"Chunk embedding memo: {len(texts) - len(missing)}/{len(texts)} reused")
+        return [known[key] for key in keys]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0
+        }
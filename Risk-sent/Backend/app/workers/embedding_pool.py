@@ -0,0 +1,103 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List
+from app.core.logging import logging
+from app.services.embedding_client import load_local_embeddings
+
+logger = logging.getLogger(__name__)
+
+# Model held by each pool process (or shared by the threads in thread mode)
+_worker_embeddings = None
+
+
+def _init_worker(torch_threads):
+    """Runs once per pool process: pin torch threads and load the model."""
+    global _worker_embeddings
+    import torch
+    torch.set_num_threads(torch_threads)
+    _worker_embeddings = load_local_embeddings()
+
+
+def _embed(texts):
+    return _worker_embeddings.embed_documents(texts)
+
+
+class EmbeddingPool:
+    """
+    Embedding execution stage for the upload worker.
+
+    Each call is sharded across `workers` processes (or threads with pinned torch
+    threads), so the event loop never blocks on the model and throughput scales with
+    cores. `max_pending` bounds how many shards may be queued on the pool at once.
+    """
+
+    def __init__(self, kind: str = "process", workers: int = 0, torch_threads: int = 1, max_pending: int = 0):
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        self.torch_threads = torch_threads
+        self.semaphore = asyncio.Semaphore(max_pending or self.workers * 2)
+
+        if kind == "thread":
+            _init_worker(torch_threads)
+            self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        else:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(torch_threads,)
+            )
+
+        self.batches = 0
+        self.texts = 0
+        self.total_ms = 0.0
+        logger.info(f"Embedding pool started with {self.workers} {kind} workers")
+
+    async def _run_shard(self, shard):
+        async with self.semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, _embed, shard)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+
+        started = time.perf_counter()
+        shard_size = -(-len(texts) // self.workers)
+        shards = [texts[i : i + shard_size] for i in range(0, len(texts), shard_size)]
+        results = await asyncio.gather(*(self._run_shard(shard) for shard in shards))
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        self.batches += 1
+        self.texts += len(texts)
+        self.total_ms += elapsed_ms
+        logger.info(f"Embedded batch of {len(texts)} texts in {len(shards)} shards in {elapsed_ms:.1f}ms")
+
+        return [vector for shard in results for vector in shard]
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch_ms": round(self.total_ms / self.batches, 1) if self.batches else 0.0,
+            "texts_per_sec": round(self.texts / (self.total_ms / 1000), 1) if self.total_ms else 0.0
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def embed_grouped(embedder, groups: List[List[str]]) -> List[List[List[float]]]:
+    """Embeds several parents' child texts in one call and regroups the vectors per parent."""
+    flat = [text for group in groups for text in group]
+    vectors = await embedder.aembed_documents(flat)
+
+    grouped, offset = [], 0
+    for group in groups:
+        grouped.append(vectors[offset : offset + len(group)])
+        offset += len(group)
+    return grouped
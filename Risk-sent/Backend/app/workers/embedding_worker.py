@@ -0,0 +1,143 @@
+import asyncio
+import json
+import time
+from app.services.redis import redis_client
+from app.core.config import settings
+from app.core.logging import logging
+from app.services.embedding_client import EMBEDDING_QUEUE, EMBEDDING_REPLY_PREFIX, load_local_embeddings
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingWorker:
+    """
+    The one process that holds the embedding model. Requests from the API, the MCP
+    server and the upload workers are drained from Redis together and embedded in a
+    single batched call.
+    """
+    def __init__(self, queue_name, max_batch_texts=256, batch_window_ms=5):
+        self.queue_name = queue_name
+        self.running = True
+        self.max_batch_texts = max_batch_texts
+        self.batch_window = batch_window_ms / 1000
+        # (request id, reason) of malformed requests, answered with the next batch's replies
+        self.rejected = []
+
+    async def start(self):
+        try :
+            self.redis = redis_client
+            self.embeddings = load_local_embeddings()
+            logger.info(f"Embedding model {settings.EMBEDDING_MODEL} loaded")
+
+            await self._redis_worker_loop()
+        except Exception as e :
+            logger.error(f"Error occured during starting the embedding worker... {str(e)}")
+
+    async def _redis_worker_loop(self):
+        """Pulls embedding requests from Redis, batches them and replies."""
+
+        logger.info(f"Embedding worker started. Listening to {self.queue_name}")
+        while self.running:
+            # Errors are handled per batch, one bad request or Redis hiccup must not stop the daemon
+            try:
+                result = await self.redis.brpop(self.queue_name, timeout=2)
+                if not result:
+                    continue
+                _, message = result
+                requests = []
+                text_count = self._accept(message, requests)
+
+                # Dynamic batching: give concurrent callers a moment to land, then drain
+                await asyncio.sleep(self.batch_window)
+                while text_count < self.max_batch_texts:
+                    message = await self.redis.rpop(self.queue_name)
+                    if message is None:
+                        break
+                    text_count += self._accept(message, requests)
+            except Exception as e:
+                logger.error(f"Redis Loop Error: {e}")
+                await asyncio.sleep(1)
+                continue
+
+            try:
+                await self._process_batch(requests)
+            except Exception as e:
+                logger.error(f"Error while replying to a batch of {len(requests)} requests: {str(e)}")
+
+    def _accept(self, message, requests):
+        """Validates one request and adds it to the batch; returns its text count."""
+        try:
+            request = json.loads(message)
+        except ValueError as e:
+            logger.error(f"Rejected embedding request that is not JSON: {str(e)}")
+            return 0
+
+        request_id = request.get("id") if isinstance(request, dict) else None
+        texts = request.get("texts") if isinstance(request, dict) else None
+        if not isinstance(request_id, str) or not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+            logger.error(f"Rejected malformed embedding request id={request_id}")
+            # Answer the caller if we can tell who it is, so it fails fast instead of timing out
+            if isinstance(request_id, str):
+                self.rejected.append((request_id, "Malformed embedding request: expected 'id' and a list of 'texts'"))
+            return 0
+
+        requests.append(request)
+        return len(texts)
+
+    async def _process_batch(self, requests):
+        texts = [text for request in requests for text in request["texts"]]
+
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            vectors = await loop.run_in_executor(None, self.embeddings.embed_documents, texts) if texts else []
+            error = None
+        except Exception as e:
+            logger.error(f"Error while embedding batch: {str(e)}")
+            vectors, error = None, str(e)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"Embedded {len(texts)} texts from {len(requests)} requests in {elapsed_ms:.1f}ms")
+
+        # Hand every caller back its own slice
+        pipe = self.redis.pipeline(transaction=False)
+        rejected, self.rejected = self.rejected, []
+        for request_id, reason in rejected:
+            reply_key = EMBEDDING_REPLY_PREFIX + request_id
+            pipe.lpush(reply_key, json.dumps({"error": reason}))
+            pipe.expire(reply_key, 60)
+        offset = 0
+        for request in requests:
+            count = len(request["texts"])
+            reply_key = EMBEDDING_REPLY_PREFIX + request["id"]
+            if error:
+                reply = {"error": error}
+            else:
+                reply = {"vectors": vectors[offset:offset + count]}
+            offset += count
+            pipe.lpush(reply_key, json.dumps(reply))
+            # Callers that timed out never pop their reply
+            pipe.expire(reply_key, 60)
+        await pipe.execute()
+
+    def stop(self):
+        """Cleanup logic."""
+        self.running = False
+        logger.info("Closing Event loop...")
+
+
+async def main():
+    worker = EmbeddingWorker(
+        EMBEDDING_QUEUE,
+        max_batch_texts=settings.EMBEDDING_DAEMON_MAX_BATCH,
+        batch_window_ms=settings.EMBEDDING_DAEMON_BATCH_WINDOW_MS
+    )
+
+    try:
+        await worker.start()
+    except asyncio.CancelledError:
+        pass
+    finally:
+        worker.stop()
+
+# --- Main Entry Point ---
+if __name__ == "__main__":
+    asyncio.run(main())
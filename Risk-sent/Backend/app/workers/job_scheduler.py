@@ -0,0 +1,177 @@
+import asyncio
+import json
+import os
+import socket
+import time
+from app.core.logging import logging
+
+logger = logging.getLogger(__name__)
+
+
+class JobScheduler:
+    """
+    Bounded, reliable consumer for a Redis list queue.
+
+    - At most `concurrency` jobs run at once; a new job is pulled as soon as a slot frees.
+    - Jobs are BLMOVE'd into a per-worker processing list and only removed (acked) once the
+      handler finishes, so a crashed worker's jobs can be put back on the queue.
+    - A failing job is retried up to `max_attempts` times with exponential backoff (it waits in
+      the `<queue>:delayed` sorted set), then parked on `<queue>:failed`.
+    - Processing lists of workers whose heartbeat expired are swept back onto the queue
+      periodically, not only at startup.
+    - Delivery is at-least-once, so handlers must be idempotent.
+    """
+
+    def __init__(self, redis, queue_name, handler, concurrency=6, worker_id=None,
+                 max_attempts=3, heartbeat_ttl=30, retry_delay=5):
+        self.redis = redis
+        self.queue_name = queue_name
+        self.handler = handler
+        self.concurrency = concurrency
+        # Per process: two workers on one host must never share a processing list
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.max_attempts = max_attempts
+        self.heartbeat_ttl = heartbeat_ttl
+        self.retry_delay = retry_delay
+
+        self.processing_list = f"{queue_name}:processing:{self.worker_id}"
+        self.heartbeat_key = f"{queue_name}:heartbeat:{self.worker_id}"
+        self.failed_list = f"{queue_name}:failed"
+        self.delayed_set = f"{queue_name}:delayed"
+
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.tasks: set[asyncio.Task] = set()
+        self.running = True
+
+    async def run(self):
+        """Consumes the queue until stop() is called."""
+        await self._requeue_orphans(include_own=True)
+        heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+        logger.info(f"Scheduler {self.worker_id} listening to {self.queue_name} with concurrency={self.concurrency}")
+
+        try:
+            while self.running:
+                # Wait for a free slot; released by the job itself when it finishes
+                await self.semaphore.acquire()
+                if not self.running:
+                    self.semaphore.release()
+                    break
+                try:
+                    message = await self.redis.blmove(
+                        self.queue_name, self.processing_list, 2, src="RIGHT", dest="LEFT"
+                    )
+                except Exception:
+                    self.semaphore.release()
+                    raise
+
+                if message is None:
+                    self.semaphore.release()
+                    continue
+
+                task = asyncio.create_task(self._run_job(message))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+        finally:
+            heartbeat_task.cancel()
+
+    async def _run_job(self, message):
+        try:
+            payload = json.loads(message)
+        except Exception as e:
+            logger.error(f"Dropping malformed job from {self.queue_name}: {str(e)}")
+            await self._move(message, self.failed_list)
+            self.semaphore.release()
+            return
+
+        try:
+            await self.handler(payload)
+            # Ack
+            await self.redis.lrem(self.processing_list, 1, message)
+        except Exception as e:
+            attempts = payload.get("attempts", 0) + 1
+            logger.error(f"Job={payload.get('job_id')} failed (attempt {attempts}/{self.max_attempts}): {str(e)}")
+            payload["attempts"] = attempts
+            if attempts < self.max_attempts:
+                await self._delay(message, json.dumps(payload), self.retry_delay * 2 ** (attempts - 1))
+            else:
+                await self._move(message, self.failed_list, json.dumps(payload))
+        finally:
+            self.semaphore.release()
+
+    async def _delay(self, message, new_message, delay):
+        """Moves a failed job from the processing list to the delayed set, due in `delay` seconds."""
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.lrem(self.processing_list, 1, message)
+        pipe.zadd(self.delayed_set, {new_message: time.time() + delay})
+        await pipe.execute()
+
+    async def _promote_delayed(self):
+        """Puts retries that are due back at the tail of the queue (consumers pop the head)."""
+        due = await self.redis.zrangebyscore(self.delayed_set, "-inf", time.time())
+        for message in due:
+            # Only the worker whose ZREM succeeds requeues it
+            if await self.redis.zrem(self.delayed_set, message):
+                await self.redis.lpush(self.queue_name, message)
+
+    async def _move(self, message, target, new_message=None):
+        """Removes a job from the processing list and pushes it (or its replacement) to `target`."""
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.lrem(self.processing_list, 1, message)
+        pipe.rpush(target, new_message or message)
+        await pipe.execute()
+
+    async def _heartbeat_loop(self):
+        """Heartbeat, due retries, and a sweep of dead workers' processing lists every heartbeat_ttl."""
+        interval = min(self.heartbeat_ttl / 3, self.retry_delay)
+        last_sweep = time.monotonic()
+        while True:
+            try:
+                await self.redis.set(self.heartbeat_key, "1", ex=self.heartbeat_ttl)
+                await self._promote_delayed()
+                # A worker that died after our startup sweep is only reclaimable once its heartbeat expires
+                if time.monotonic() - last_sweep >= self.heartbeat_ttl:
+                    last_sweep = time.monotonic()
+                    await self._requeue_orphans()
+            except asyncio.CancelledError:
+                return
+            except Exception as e:
+                logger.error(f"Heartbeat error: {str(e)}")
+            await asyncio.sleep(interval)
+
+    async def _requeue_orphans(self, include_own=False):
+        """
+        Puts back jobs left in lists of workers whose heartbeat expired, and in our own list when
+        `include_own` (at startup, before anything of ours is in flight).
+        """
+        prefix = f"{self.queue_name}:processing:"
+        async for key in self.redis.scan_iter(match=prefix + "*"):
+            worker_id = key[len(prefix):]
+            if worker_id == self.worker_id:
+                if not include_own:
+                    continue
+            elif await self.redis.exists(f"{self.queue_name}:heartbeat:{worker_id}"):
+                continue
+
+            requeued = 0
+            # RIGHT -> RIGHT keeps them at the head of the queue
+            while await self.redis.lmove(key, self.queue_name, src="RIGHT", dest="RIGHT") is not None:
+                requeued += 1
+            if requeued:
+                logger.info(f"Requeued {requeued} unfinished jobs from worker {worker_id}")
+
+    def stop(self):
+        """Stops pulling new jobs; running ones keep going until drain()."""
+        self.running = False
+
+    async def drain(self, timeout=None):
+        """Waits for in-flight jobs. Jobs still running after `timeout` stay in the processing list."""
+        self.stop()
+        if not self.tasks:
+            return
+        logger.info(f"Draining {len(self.tasks)} in-flight jobs...")
+        done, pending = await asyncio.wait(set(self.tasks), timeout=timeout)
+        if pending:
+            logger.warning(f"{len(pending)} jobs did not finish in time; they will be requeued once our heartbeat expires")
+            for task in pending:
+                task.cancel()
+        await self.redis.delete(self.heartbeat_key)
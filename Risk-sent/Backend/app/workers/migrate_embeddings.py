@@ -0,0 +1,120 @@
+import argparse
+import asyncio
+import bson
+import numpy as np
+from pymongo import UpdateOne
+from app.core.logging import logging
+from app.db.client import mongo_client
+from app.utils.vector_codec import encode_embedding, decode_embeddings
+
+logger = logging.getLogger(__name__)
+
+
+def _recall_at_k(original, converted, k, queries):
+    """Mean overlap of the exact top-k (cosine) under the original and the converted vectors."""
+    def normalize(vectors):
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    original = normalize(original)
+    converted = normalize(converted)
+    k = min(k, len(original))
+    overlaps = []
+    for q in queries:
+        query = original[q]
+        expected = set(np.argsort(-(original @ query))[:k])
+        actual = set(np.argsort(-(converted @ query))[:k])
+        overlaps.append(len(expected & actual) / k)
+    return float(np.mean(overlaps)) if overlaps else 1.0
+
+
+def _record_size(record):
+    return len(bson.encode({k: record[k] for k in ("embedding", "embedding_scale") if record.get(k) is not None}))
+
+
+async def measure(db, storage, sample_docs=5, queries_per_doc=20, k=10):
+    """Recall@k and per-record size of `storage` against the current vectors, on a sample of documents."""
+    doc_ids = (await db.children.distinct("doc_id"))[:sample_docs]
+    recalls = []
+    size_before = size_after = 0
+    for doc_id in doc_ids:
+        children = await db.children.find(
+            {"doc_id": doc_id},
+            {"embedding": 1, "embedding_scale": 1}
+        ).to_list(length=None)
+        if not children:
+            continue
+        original = decode_embeddings(children)
+        converted_records = [encode_embedding(vector, storage) for vector in original]
+        converted = decode_embeddings(converted_records)
+
+        size_before += sum(_record_size(c) for c in children)
+        size_after += sum(_record_size(r) for r in converted_records)
+
+        rng = np.random.default_rng(0)
+        queries = rng.choice(len(children), size=min(queries_per_doc, len(children)), replace=False)
+        recalls.append(_recall_at_k(original, converted, k, queries))
+
+    return {
+        "documents": len(recalls),
+        f"recall@{k}": round(float(np.mean(recalls)), 4) if recalls else None,
+        "embedding_bytes_before": size_before,
+        "embedding_bytes_after": size_after,
+        "size_ratio": round(size_after / size_before, 3) if size_before else None
+    }
+
+
+async def migrate(db, storage, batch_size=500, doc_id=None):
+    """Rewrites the `embedding` of every child (optionally of one document) in `storage` format."""
+    query = {"doc_id": doc_id} if doc_id else {}
+    cursor = db.children.find(query, {"embedding": 1, "embedding_scale": 1}).batch_size(batch_size)
+
+    updates = []
+    migrated = 0
+    async for child in cursor:
+        vector = decode_embeddings([child])[0]
+        fields = encode_embedding(vector, storage)
+        update = {"$set": fields}
+        if "embedding_scale" not in fields:
+            update["$unset"] = {"embedding_scale": ""}
+        updates.append(UpdateOne({"_id": child["_id"]}, update))
+
+        if len(updates) >= batch_size:
+            await db.children.bulk_write(updates, ordered=False)
+            migrated += len(updates)
+            updates = []
+            logger.info(f"Migrated {migrated} children to {storage}")
+
+    if updates:
+        await db.children.bulk_write(updates, ordered=False)
+        migrated += len(updates)
+    return migrated
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Rewrite child embeddings as float32 arrays, float16 or int8 binaries")
+    parser.add_argument("storage", choices=["float32", "float16", "int8"])
+    parser.add_argument("--doc-id", default=None)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--measure-only", action="store_true", help="report recall/size on a sample, write nothing")
+    args = parser.parse_args()
+
+    await mongo_client.connect()
+    db = mongo_client.db
+    try:
+        report = await measure(db, args.storage)
+        logger.info(f"Sampled effect of {args.storage}: {report}")
+        print(report)
+        if args.measure_only:
+            return
+
+        before = (await db.command("collStats", "children")).get("size")
+        migrated = await migrate(db, args.storage, args.batch_size, args.doc_id)
+        after = (await db.command("collStats", "children")).get("size")
+        print(f"Migrated {migrated} children, children collection {before} -> {after} bytes")
+        # Set EMBEDDING_STORAGE to the same value (and rebuild the Atlas index for int8) before serving
+    finally:
+        await mongo_client.close()
+
+# python -m app.workers.migrate_embeddings int8 [--measure-only]
+if __name__ == "__main__":
+    asyncio.run(main())
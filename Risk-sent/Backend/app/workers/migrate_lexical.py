@@ -0,0 +1,65 @@
+import argparse
+import asyncio
+from pymongo import UpdateOne
+from app.core.logging import logging
+from app.db.client import mongo_client
+from app.services.redis import redis_client
+from app.services.retrieval_cache import invalidate_document
+from app.utils.lexical import lexical_fields
+
+logger = logging.getLogger(__name__)
+
+
+async def migrate(db, batch_size=500, doc_id=None, rebuild=False):
+    """
+    Writes the `lexical` fields (BM25 terms) of every child that lacks them, optionally of one
+    document only. `rebuild` rewrites them all, e.g. after a tokenizer change.
+    """
+    query = {"doc_id": doc_id} if doc_id else {}
+    if not rebuild:
+        query["lexical.terms"] = {"$exists": False}
+    cursor = db.children.find(query, {"text_snippet": 1, "doc_id": 1}).batch_size(batch_size)
+
+    updates = []
+    doc_ids = set()
+    migrated = 0
+    async for child in cursor:
+        updates.append(UpdateOne(
+            {"_id": child["_id"]},
+            {"$set": {"lexical": lexical_fields(child.get("text_snippet") or "")}}
+        ))
+        doc_ids.add(child.get("doc_id"))
+
+        if len(updates) >= batch_size:
+            await db.children.bulk_write(updates, ordered=False)
+            migrated += len(updates)
+            updates = []
+            logger.info(f"Tokenized {migrated} children")
+
+    if updates:
+        await db.children.bulk_write(updates, ordered=False)
+        migrated += len(updates)
+    return migrated, doc_ids
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Backfill the BM25 lexical fields of children ingested without them")
+    parser.add_argument("--doc-id", default=None)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--rebuild", action="store_true", help="rewrite the fields of every child, not only missing ones")
+    args = parser.parse_args()
+
+    await mongo_client.connect()
+    db = mongo_client.db
+    try:
+        migrated, doc_ids = await migrate(db, args.batch_size, args.doc_id, args.rebuild)
+        # Running processes cache per-document BM25 totals and vector-only results
+        for migrated_doc_id in doc_ids:
+            await invalidate_document(redis_client, migrated_doc_id)
+        print(f"Tokenized {migrated} children of {len(doc_ids)} documents")
+    finally:
+        await mongo_client.close()
+
+# python -m app.workers.migrate_lexical [--doc-id <id>] [--rebuild]
+if __name__ == "__main__":
+    asyncio.run(main())
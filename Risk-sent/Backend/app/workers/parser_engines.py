@@ -0,0 +1,151 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from app.core.logging import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ParseError(Exception):
+    """The parser reported a failure for the document itself (e.g. unreadable PDF)."""
+    pass
+
+
+class ParserEngine:
+    """
+    What ParseWorker needs from a PDF parser: `iter_pages` yields (page_number, text) in
+    page order, page numbers starting at 1 and every page text ending with "\\n", and raises
+    ParseError when the document cannot be parsed.
+    """
+
+    async def start(self):
+        pass
+
+    def iter_pages(self, job_id: str, file_path: str, stream: bool = True):
+        raise NotImplementedError
+
+    def stats(self):
+        return {}
+
+    async def stop(self):
+        pass
+
+
+# --- Pure-Python engine: page ranges parsed in parallel by a process pool ---
+
+def _count_pages(file_path):
+    from pypdf import PdfReader
+    return len(PdfReader(file_path).pages)
+
+
+def _extract_range(file_path, start, end, backend):
+    """Runs in a pool process: text of pages [start, end) (0-based), one string per page."""
+    pages = []
+    if backend == "pypdf":
+        from pypdf import PdfReader
+        reader = PdfReader(file_path)
+        for i in range(start, end):
+            pages.append((reader.pages[i].extract_text() or "") + "\n")
+    else:
+        import pdfplumber
+        with pdfplumber.open(file_path) as pdf:
+            for i in range(start, end):
+                pages.append((pdf.pages[i].extract_text() or "") + "\n")
+    return pages
+
+
+class PythonParserEngine(ParserEngine):
+    """
+    Linux-native engine with no external binary. The page range of a PDF is cut into
+    `pages_per_task` slices which a process pool extracts in parallel (pdfplumber or pypdf);
+    slices are yielded in page order as soon as they are done.
+    """
+
+    def __init__(self, workers=0, pages_per_task=8, backend="pdfplumber"):
+        self.workers = workers or os.cpu_count() or 1
+        self.pages_per_task = pages_per_task
+        self.backend = backend
+        self.executor = None
+
+    async def start(self):
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        logger.info(f"Python parser engine started with {self.workers} processes ({self.backend})")
+
+    async def iter_pages(self, job_id, file_path, stream=True):
+        loop = asyncio.get_running_loop()
+        try:
+            page_count = await loop.run_in_executor(self.executor, _count_pages, file_path)
+        except Exception as e:
+            raise ParseError(f"Could not open file: {str(e)}")
+
+        ranges = [
+            (start, min(start + self.pages_per_task, page_count))
+            for start in range(0, page_count, self.pages_per_task)
+        ]
+        # Keep a bounded window of slices in flight so a 500-page filing isn't all in memory at once
+        window = self.workers * 2
+        futures = []
+        next_range = 0
+
+        def submit_next():
+            nonlocal next_range
+            if next_range < len(ranges):
+                start, end = ranges[next_range]
+                futures.append(loop.run_in_executor(self.executor, _extract_range, file_path, start, end, self.backend))
+                next_range += 1
+
+        for _ in range(window):
+            submit_next()
+
+        try:
+            for start, _ in ranges:
+                try:
+                    pages = await futures.pop(0)
+                except Exception as e:
+                    raise ParseError(f"Failed to extract pages from {start + 1}: {str(e)}")
+                submit_next()
+                for offset, text in enumerate(pages):
+                    yield start + offset + 1, text
+        finally:
+            for future in futures:
+                future.cancel()
+
+        logger.info(f"Job={job_id} Text parsing completed. Pages: {page_count}")
+
+    def stats(self):
+        return {"engine": "python", "workers": self.workers, "backend": self.backend}
+
+    async def stop(self):
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def _benchmark(engine, file_path):
+    import time
+
+    await engine.start()
+    try:
+        started = time.perf_counter()
+        first_page_ms = None
+        pages = chars = 0
+        async for _, text in engine.iter_pages("benchmark", file_path):
+            if first_page_ms is None:
+                first_page_ms = (time.perf_counter() - started) * 1000
+            pages += 1
+            chars += len(text)
+        total_ms = (time.perf_counter() - started) * 1000
+        print(f"{pages} pages, {chars} chars, first page {first_page_ms or 0:.1f}ms, total {total_ms:.1f}ms")
+    finally:
+        await engine.stop()
+
+
+# python -m app.workers.parser_engines <file.pdf> [python|cpp] -- parse one PDF and time it
+if __name__ == "__main__":
+    import sys
+    from app.workers.parsing_worker import build_parser_engine
+
+    asyncio.run(_benchmark(build_parser_engine(sys.argv[2] if len(sys.argv) > 2 else "python"), sys.argv[1]))
@@ -0,0 +1,250 @@
+import asyncio
+import time
+from app.core.logging import logging
+from app.workers.parser_protocol import read_frame, encode_request, FRAME_END
+from app.workers.parser_engines import ParserEngine, ParseError
+
+logger = logging.getLogger(__name__)
+
+
+class ParserDiedError(Exception):
+    """The parser process went away while it still had the job."""
+    pass
+
+
+class ParserProcess:
+    """One C++ parser child plus the bookkeeping of the jobs it currently owns."""
+
+    def __init__(self, command, index):
+        self.command = command
+        self.index = index
+        self.process = None
+        self.reader_task = None
+        self.futures = {}
+        # job_id -> asyncio.Queue of PAGE/END frames (or a ParserDiedError) for streaming jobs
+        self.streams = {}
+        # job_id -> submit time, for the stuck-job health check
+        self.started_at = {}
+
+    async def start(self):
+        self.process = await asyncio.create_subprocess_exec(
+            *self.command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=None
+        )
+        self.reader_task = asyncio.create_task(self._reader_loop())
+        logger.info(f"Parser[{self.index}] started with pid={self.process.pid}")
+
+    @property
+    def outstanding(self):
+        return len(self.started_at)
+
+    @property
+    def alive(self):
+        return (
+            self.process is not None
+            and self.process.returncode is None
+            and self.reader_task is not None
+            and not self.reader_task.done()
+        )
+
+    def oldest_job_age(self):
+        if not self.started_at:
+            return 0
+        return time.monotonic() - min(self.started_at.values())
+
+    async def _reader_loop(self):
+        """Listens to C++ stdout and dispatches frames to the waiting jobs."""
+        try:
+            while True:
+                frame = await read_frame(self.process.stdout)
+                job_id = frame.job_id
+
+                # Streaming jobs: hand each page to the job's queue as it arrives
+                if job_id in self.streams:
+                    stream = self.streams[job_id]
+                    if frame.kind == FRAME_END:
+                        self.streams.pop(job_id)
+                        self.started_at.pop(job_id, None)
+                    stream.put_nowait(frame)
+
+                # Wake up the specific awaiting job
+                elif job_id in self.futures:
+                    self.started_at.pop(job_id, None)
+                    self.futures.pop(job_id).set_result(frame)
+        except asyncio.IncompleteReadError:
+            logger.error(f"Parser[{self.index}] closed its stdout")
+        except Exception as e:
+            logger.error(f"Parser[{self.index}] error while reading from stdout stream {str(e)}")
+        finally:
+            self._fail_pending(ParserDiedError(f"Parser[{self.index}] exited"))
+
+    def _fail_pending(self, error):
+        """Fails every job still owned by this process instead of leaving it hanging."""
+        for future in self.futures.values():
+            if not future.done():
+                future.set_exception(error)
+        for stream in self.streams.values():
+            stream.put_nowait(error)
+        self.futures.clear()
+        self.streams.clear()
+        self.started_at.clear()
+
+    async def send(self, request):
+        job_id = request["job_id"]
+        self.started_at[job_id] = time.monotonic()
+        try:
+            self.process.stdin.write(encode_request(request))
+            await self.process.stdin.drain()
+        except Exception as e:
+            logger.error(f"Error occured while sending the job with id={job_id} to Parser[{self.index}] {str(e)}")
+            self.started_at.pop(job_id, None)
+            self.futures.pop(job_id, None)
+            self.streams.pop(job_id, None)
+            raise ParserDiedError(str(e))
+
+    async def submit(self, request):
+        future = asyncio.get_running_loop().create_future()
+        self.futures[request["job_id"]] = future
+        await self.send(request)
+        return future
+
+    async def open_stream(self, request):
+        stream = asyncio.Queue()
+        self.streams[request["job_id"]] = stream
+        await self.send(request)
+        return stream
+
+    async def stop(self):
+        if self.process and self.process.returncode is None:
+            self.process.terminate()
+            try:
+                await asyncio.wait_for(self.process.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                self.process.kill()
+        if self.reader_task:
+            await asyncio.gather(self.reader_task, return_exceptions=True)
+
+
+class ParserPool(ParserEngine):
+    """
+    C++ engine: N parser processes with least-outstanding-jobs dispatch.
+
+    A health loop restarts dead children and kills children stuck on a job for longer than
+    `job_timeout`; their pending jobs fail with ParserDiedError and iter_pages() retries
+    them on another child.
+    """
+
+    def __init__(self, command, size=1, health_interval=5, job_timeout=600, max_retries=2):
+        self.command = command
+        self.size = size
+        self.health_interval = health_interval
+        self.job_timeout = job_timeout
+        self.max_retries = max_retries
+        self.processes = []
+        self.health_task = None
+
+    async def start(self):
+        for index in range(self.size):
+            parser = ParserProcess(self.command, index)
+            await parser.start()
+            self.processes.append(parser)
+        self.health_task = asyncio.create_task(self._health_loop())
+        logger.info(f"Parser pool started with {self.size} processes")
+
+    def _pick(self):
+        candidates = [p for p in self.processes if p.alive]
+        if not candidates:
+            raise ParserDiedError("No live parser process")
+        return min(candidates, key=lambda p: p.outstanding)
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for i, parser in enumerate(self.processes):
+                try:
+                    if parser.alive and parser.oldest_job_age() > self.job_timeout:
+                        logger.error(f"Parser[{i}] stuck for more than {self.job_timeout}s, killing it")
+                        parser.process.kill()
+                        await asyncio.gather(parser.reader_task, return_exceptions=True)
+
+                    if not parser.alive:
+                        logger.warning(f"Parser[{i}] is dead, restarting")
+                        await parser.stop()
+                        replacement = ParserProcess(self.command, i)
+                        await replacement.start()
+                        self.processes[i] = replacement
+                except Exception as e:
+                    logger.error(f"Health check failed for Parser[{i}] {str(e)}")
+
+    def stats(self):
+        return {
+            "engine": "cpp",
+            "processes": [
+                {"index": p.index, "alive": p.alive, "outstanding": p.outstanding}
+                for p in self.processes
+            ]
+        }
+
+    async def iter_pages(self, job_id, file_path, stream=True):
+        """
+        Yields (page_number, text) for the document. If the child dies mid-job the job is
+        resent to another child and pages that were already yielded are skipped.
+        """
+        last_page = 0
+        attempt = 0
+        while True:
+            request = {"job_id": job_id, "file_path": file_path, "stream": stream}
+            try:
+                parser = self._pick()
+                logger.info(f"Sending the job id={job_id} to Parser[{parser.index}] (attempt {attempt + 1})")
+
+                if stream:
+                    pages = self._stream_pages(await parser.open_stream(request))
+                else:
+                    pages = self._result_pages(await parser.submit(request))
+
+                async for page_number, text in pages:
+                    if page_number <= last_page:
+                        continue
+                    last_page = page_number
+                    yield page_number, text
+                return
+            except ParserDiedError as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise ParseError(f"Parser died {attempt} times while parsing: {str(e)}")
+                logger.warning(f"Job={job_id} lost its parser ({str(e)}), retrying")
+                await asyncio.sleep(self.health_interval)
+
+    async def _stream_pages(self, queue):
+        while True:
+            frame = await queue.get()
+            if isinstance(frame, Exception):
+                raise frame
+            if frame.kind == FRAME_END:
+                if frame.failed:
+                    raise ParseError(frame.error)
+                logger.info(f"Job={frame.job_id} Text parsing completed. Pages: {frame.page_count}")
+                return
+            yield frame.page_number, frame.text()
+            frame.release()
+
+    async def _result_pages(self, future):
+        frame = await future
+        if frame.failed:
+            error = frame.error
+            frame.release()
+            raise ParseError(error)
+
+        logger.info(f"Job={frame.job_id} Text parsing completed. Pages: {frame.page_count}")
+        for page_number, segment in frame.page_segments():
+            yield page_number, str(segment, "utf-8", errors="replace")
+            segment.release()
+        frame.release()
+
+    async def stop(self):
+        if self.health_task:
+            self.health_task.cancel()
+        await asyncio.gather(*(p.stop() for p in self.processes), return_exceptions=True)
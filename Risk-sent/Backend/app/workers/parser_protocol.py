@@ -0,0 +1,112 @@
+import json
+import struct
+
+# --- Binary framing between ParseWorker and the C++ parser (app/workers/worker.cpp) ---
+#
+# Requests are unchanged: 4-byte little-endian length + JSON {"job_id", "file_path"}.
+#
+# Responses are versioned binary frames, all integers little-endian:
+#
+#   magic "RSPF" | version u8 | kind u8 | status u8 | pad u8 | job_id_len u16 | pad u16 |
+#   page_count u32 | body_len u32
+#
+# followed by `body_len` bytes of body:
+#
+#   job_id (job_id_len bytes)
+#   STATUS_OK:     page_count x u32 page byte lengths, then the raw UTF-8 pages back to back
+#   STATUS_FAILED: the UTF-8 error message
+#
+# Pages keep the trailing "\n" the parser always added between pages, so the page
+# segments concatenated are exactly the document text.
+#
+# Streaming jobs (request has "stream": true) instead get one FRAME_PAGE per page as soon
+# as it is extracted, with `page_count` holding the 1-based page number and the body being
+# job_id + page text, followed by a FRAME_END whose `page_count` is the total number of
+# pages (body: job_id, plus the error message when STATUS_FAILED).
+
+MAGIC = b"RSPF"
+VERSION = 1
+
+FRAME_RESULT = 1
+FRAME_PAGE = 2
+FRAME_END = 3
+
+STATUS_OK = 0
+STATUS_FAILED = 1
+
+HEADER = struct.Struct("<4sBBBxHxxII")
+PAGE_LENGTH = struct.Struct("<I")
+REQUEST_HEADER = struct.Struct("<I")
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class ParseFrame:
+    """A decoded response frame. Page segments are memoryview slices of the frame body, not copies."""
+
+    def __init__(self, kind, status, job_id, page_count, body, data_offset):
+        self.kind = kind
+        self.status = status
+        self.job_id = job_id
+        self.page_count = page_count
+        self.body = body
+        self.data_offset = data_offset
+
+    @property
+    def failed(self):
+        return self.status != STATUS_OK
+
+    @property
+    def error(self):
+        if not self.failed:
+            return None
+        return str(self.body[self.data_offset:], "utf-8", errors="replace")
+
+    @property
+    def page_number(self):
+        """Page number carried by a FRAME_PAGE."""
+        return self.page_count
+
+    def page_segments(self):
+        """Yields (page_number, memoryview) for every page, page numbers starting at 1."""
+        table = self.data_offset - self.page_count * PAGE_LENGTH.size
+        offset = self.data_offset
+        for i in range(self.page_count):
+            (length,) = PAGE_LENGTH.unpack_from(self.body, table + i * PAGE_LENGTH.size)
+            yield i + 1, self.body[offset : offset + length]
+            offset += length
+
+    def text(self):
+        """The whole document text, decoded straight from the frame buffer in one pass."""
+        return str(self.body[self.data_offset:], "utf-8", errors="replace")
+
+    def release(self):
+        """Drops the frame buffer once the caller has what it needs."""
+        self.body.release()
+
+
+def encode_request(job: dict) -> bytes:
+    payload = json.dumps(job).encode("utf-8")
+    return REQUEST_HEADER.pack(len(payload)) + payload
+
+
+async def read_frame(stream) -> ParseFrame:
+    """Reads one response frame from an asyncio StreamReader."""
+    header = await stream.readexactly(HEADER.size)
+    magic, version, kind, status, job_id_len, page_count, body_len = HEADER.unpack(header)
+
+    if magic != MAGIC:
+        raise ProtocolError(f"Bad frame magic {magic!r}")
+    if version != VERSION:
+        raise ProtocolError(f"Unsupported protocol version {version}")
+
+    body = memoryview(await stream.readexactly(body_len))
+    job_id = str(body[:job_id_len], "utf-8")
+
+    data_offset = job_id_len
+    if kind == FRAME_RESULT and status == STATUS_OK:
+        data_offset += page_count * PAGE_LENGTH.size
+
+    return ParseFrame(kind, status, job_id, page_count, body, data_offset)
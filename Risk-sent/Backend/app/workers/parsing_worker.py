@@ -2,22 +2,45 @@ import asyncio
 import struct
 import json
 import signal
-from uuid import uuid4
 from app.services.redis import redis_client
 from app.core.logging import logging
 from app.db.client import mongo_client
+from app.core.config import settings
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from bson import ObjectId
+from pymongo import ReturnDocument
+from app.workers.parser_engines import ParserEngine, PythonParserEngine, ParseError
+from app.workers.parser_pool import ParserPool
+from app.workers.progress import progress_pipeline
+from app.services.retrieval_cache import invalidate_document
+from app.utils.chunking import StreamingSplitter
 
 logger = logging.getLogger(__name__)
 
+def build_parser_engine(name=None) -> ParserEngine:
+    """"cpp" (pool of C++ parser processes) or "python" (pdfplumber/pypdf over a process pool)."""
+    name = (name or settings.PARSER_ENGINE).lower()
+    if name == "python":
+        return PythonParserEngine(
+            workers=settings.PYTHON_PARSER_WORKERS,
+            pages_per_task=settings.PYTHON_PARSER_PAGES_PER_TASK,
+            backend=settings.PYTHON_PARSER_BACKEND
+        )
+
+    launcher = [settings.PARSER_LAUNCHER] if settings.PARSER_LAUNCHER else []
+    return ParserPool(
+        launcher + [settings.PARSER_EXECUTABLE],
+        size=settings.PARSER_POOL_SIZE,
+        health_interval=settings.PARSER_HEALTH_INTERVAL,
+        job_timeout=settings.PARSER_JOB_TIMEOUT
+    )
+
 class ParseWorker:
-    def __init__(self, cpp_executable , queue_name):
-        self.cpp_executable = cpp_executable
+    def __init__(self, engine , queue_name , streaming=True):
+        self.engine = engine
         self.queue_name = queue_name
-        self.process = None
-        self.futures = {}
+        self.streaming = streaming
         self.running = True
         self.db = None
 
@@ -29,46 +52,18 @@ class ParseWorker:
             # 2. Connect to Database
             await mongo_client.connect()
             self.db = mongo_client.db
-            # 3. Launch C++ Child Process
-            self.process = await asyncio.create_subprocess_exec(
-                'wsl' ,
-                self.cpp_executable,
-                stdin=asyncio.subprocess.PIPE,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=None
-            )
-            logger.info("Created the cpp child process successfully")
+            # 3. Start the parser engine (C++ child processes or the Python process pool)
+            await self.engine.start()
+            logger.info(f"Parser engine started {self.engine.stats()}")
 
             # 2. Splitters
             self.parent_splitter = RecursiveCharacterTextSplitter(chunk_size=1500, chunk_overlap=150)
 
-            # 4. Start background loops
-            # One to read from C++, one to pull from Redis
-            self.reader_task = asyncio.create_task(self._cpp_reader_loop())
+            # 4. Pull from Redis
             await self._redis_worker_loop()
         except Exception as e : 
             logger.error("Error occured during starting the worker... " , str(e))    
 
-    async def _cpp_reader_loop(self):
-        """Listens to C++ stdout and dispatches results."""
-        try:
-            while self.running:
-                # Read 4-byte header
-                header = await self.process.stdout.readexactly(4)
-                msg_len = struct.unpack('I', header)[0]
-                
-                # Read JSON payload
-                raw_data = await self.process.stdout.readexactly(msg_len)
-                data = json.loads(raw_data.decode('utf-8'))
-                
-                # Wake up the specific awaiting Redis task
-                job_id = data.get("job_id")
-                if job_id in self.futures:
-                    self.futures.pop(job_id).set_result(data)
-        except Exception as e:
-            logger.error("Error occured while reading from stdout stream " , str(e))
-
-
     async def _redis_worker_loop(self):
         """Pulls jobs from Redis and hands them to C++."""
     
@@ -85,111 +80,150 @@ class ParseWorker:
         except Exception as e:
             print(f"Redis Loop Error: {e}")
 
-    async def send_job_to_cpp(self , job_data) :
-        """Sends the job to cpp child process"""
-
-        payload = json.dumps(job_data).encode("utf-8")
-        length = len(payload)
-
-        # Pack length as 4 bytes 
-        header = struct.pack("I", length)
-
-        try :
-            self.process.stdin.write(header)
-            self.process.stdin.write(payload)
-            await self.process.stdin.drain()
-        except Exception as e : 
-            logger.error(f"Error occured while sending the job with id={job_data["job_data"]} to child process " , str(e))    
-
     async def _process_job(self, job_data):
-        """Orchestrates a single job."""
-        job_id = job_data['job_id']
-        # Create a "pager" for this specific job
-        loop = asyncio.get_running_loop()
-        future = loop.create_future()
-        self.futures[job_id] = future
-
-        # Send to C++ via stdin
-        logger.info(f"Sending the job id={job_id} to child process for parsing")
-        await self.send_job_to_cpp({ "job_id" : job_data['job_id'] , "file_path" : job_data['file_path']})
-
-        # Wait for C++ to respond via the reader_loop
-        result = await future
-        logger.info(f"Job={job_id} Text parsing completed. Text length: {len(result['text'])}")
-
-        if (result["status"] == "Failed") :
+        """Runs one job; any failure marks the document Failed instead of leaving it processing."""
+        doc_id = job_data['doc_id']
+        try:
+            await self._ingest(job_data)
+        except ParseError as e:
+            await self._mark_failed(doc_id, e)
+        except Exception as e:
+            logger.exception(f"doc_id={doc_id} Parse job failed")
+            await self._mark_failed(doc_id, e)
+
+    async def _mark_failed(self, doc_id, error):
+        """
+        Flags the document Failed, then drops the chunks its batches already wrote so a partial
+        document is never searchable. Batches still in flight see the status and clean up after
+        themselves (see UploadWorker._process_job).
+        """
+        try:
             await self.db.document.update_one(
             {"_id": ObjectId(doc_id)},
-            {"$set": {"status": "Failed" , "percent_complete" : 100 , "error_message" : result["error"]}}
+            {"$set": {"status": "Failed" , "percent_complete" : 100 , "error_message" : str(error)}}
             )
-            return
+            await asyncio.gather(
+                self.db.children.delete_many({"doc_id" : doc_id}) ,
+                self.db.parents.delete_many({"doc_id" : doc_id})
+            )
+            await invalidate_document(self.redis, doc_id)
+        except Exception as e:
+            logger.error(f"doc_id={doc_id} Could not mark the document as failed {str(e)}")
 
-        text = result['text']
+    async def _ingest(self, job_data):
+        """Parent chunks are queued for embedding while parsing is still running."""
+        job_id = job_data['job_id']
         doc_id = job_data['doc_id']
         user_id = job_data['user_id']
 
-
-        initial_doc = Document(page_content=text, metadata={"source": doc_id})
-        parent_docs = self.parent_splitter.split_documents([initial_doc])
-
-        number_of_parent_chunks = len(parent_docs)
-        number_of_chunk_processed = 0
-        logger.info(f"doc_id={doc_id} The document has been splited to {number_of_parent_chunks} chunks")
-
         await self.db.document.update_one(
             {"_id" : ObjectId(doc_id)} ,
             {"$set" : {
-                "number_of_chunk_processed" : number_of_chunk_processed ,
-                "number_of_parent_chunks" : number_of_parent_chunks ,
-                "percent_complete" : 0
+                # A re-parse of a Failed document starts over (its batches check this status)
+                "status" : "processing" ,
+                "number_of_chunk_processed" : 0 ,
+                "number_of_parent_chunks" : 0 ,
+                "percent_complete" : 0 ,
+                "parsing_complete" : False ,
+                # Upload job ids already counted (see UploadWorker._process_job)
+                "processed_jobs" : []
             }}
         )
+        # Re-ingesting: nothing cached for the old content may be served any more
+        await invalidate_document(self.redis, doc_id)
 
+        splitter = StreamingSplitter(self.parent_splitter, {"source": doc_id})
+        pending = []
+        number_of_parent_chunks = 0
+        total_pages = 0
         batch_size = 10
-        # Iterate through parent_docs in steps of 10
-        for i in range(0, number_of_parent_chunks, batch_size):
-            # Slice the list to get a batch
-            batch_slice = parent_docs[i : i + batch_size]
-            # Prepare the list of parent doc content/metadata
-            parent_list = [
-                {"text": p.page_content, "metadata": p.metadata} 
-                for p in batch_slice
-            ]
-
-            # Construct the job object
-            queue_job = {
-                "job_id": str(uuid4()),
-                "data": {
-                    "doc_id": doc_id,
-                    "user_id": user_id,
-                    "parent_docs": parent_list
-                }
+
+        pages = self.engine.iter_pages(job_id, job_data['file_path'], stream=self.streaming)
+        async for page_number, page_text in pages:
+            total_pages = page_number
+            pending.extend(splitter.feed(page_text, page_number))
+            # Push every full batch of 10 as soon as it is ready
+            while len(pending) >= batch_size:
+                await self._push_batch(doc_id, user_id, pending[:batch_size], f"{job_id}:{number_of_parent_chunks // batch_size}")
+                number_of_parent_chunks += batch_size
+                pending = pending[batch_size:]
+
+        pending.extend(splitter.flush())
+        for i in range(0, len(pending), batch_size):
+            batch_number = (number_of_parent_chunks + i) // batch_size
+            await self._push_batch(doc_id, user_id, pending[i : i + batch_size], f"{job_id}:{batch_number}")
+        number_of_parent_chunks += len(pending)
+        logger.info(f"doc_id={doc_id} The document has been splited to {number_of_parent_chunks} chunks")
+
+        # Upload workers may already have caught up, so completion is evaluated here as well.
+        # The upload handler no longer opens the PDF, so the page count is recorded here
+        document = await self.db.document.find_one_and_update(
+            {"_id" : ObjectId(doc_id)} ,
+            [{"$set" : {"metadata" : {"$mergeObjects" : ["$metadata" , {"total_pages" : total_pages}]}}}]
+            + progress_pipeline(0, parsing_complete=True) ,
+            projection={"status" : 1} ,
+            return_document=ReturnDocument.AFTER
+        )
+        if document and document.get("status") == "processed":
+            await invalidate_document(self.redis, doc_id)
+
+    async def _push_batch(self, doc_id, user_id, batch_slice, batch_job_id):
+        """
+        Announces the batch on the document, then queues it for the upload workers.
+        `batch_job_id` is derived from the parse job, so a re-parse produces the same ids.
+        """
+        # Prepare the list of parent doc content/metadata
+        parent_list = [
+            {"text": p.page_content, "metadata": p.metadata} 
+            for p in batch_slice
+        ]
+
+        # Construct the job object
+        queue_job = {
+            "job_id": batch_job_id,
+            "data": {
+                "doc_id": doc_id,
+                "user_id": user_id,
+                "parent_docs": parent_list
             }
+        }
+
+        # Count it before it can be processed, so processed can never overtake the total
+        await self.db.document.update_one(
+            {"_id" : ObjectId(doc_id)} ,
+            {"$inc" : {"number_of_parent_chunks" : len(batch_slice)}}
+        )
 
-            # Push to Redis queue "upload_queue"
-            # Using rpush to add to the end of the list
-            await self.redis.rpush("upload_queue", json.dumps(queue_job))
-            
-            logger.info(f"Batched {len(batch_slice)} docs for doc_id {doc_id} to upload_queue")
+        # Push to Redis queue "upload_queue"
+        # Using rpush to add to the end of the list
+        await self.redis.rpush("upload_queue", json.dumps(queue_job))
+        
+        logger.info(f"Batched {len(batch_slice)} docs for doc_id {doc_id} to upload_queue")
                 
 
     def stop(self):
-        """Cleanup logic."""
+        """Stops pulling new jobs."""
         self.running = False
-        if self.process:
 
-            logger.info("Terminating C++ Child Process...")
-            self.process.terminate()
+    async def shutdown(self):
+        """Cleanup logic."""
+        self.stop()
+        logger.info("Stopping the parser engine...")
+        await self.engine.stop()
 
 async def main():
-    worker = ParseWorker("/mnt/c/Users/Lenovo/OneDrive/Desktop/DE Shaw/Risk-sent/Backend/app/workers/worker", "parse_queue")
+    worker = ParseWorker(
+        build_parser_engine(),
+        "parse_queue",
+        streaming=settings.PARSER_STREAMING
+    )
 
     try:
         await worker.start()
     except asyncio.CancelledError:
         pass
     finally:
-        worker.stop()
+        await worker.shutdown()
 
 # --- Main Entry Point ---
 if __name__ == "__main__":
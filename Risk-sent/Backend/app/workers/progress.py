@@ -0,0 +1,71 @@
+def progress_pipeline(parents_done: int = 0, parsing_complete: bool = None, job_id: str = None) -> list:
+    """
+    Update pipeline for a `document`: $inc the processed counter, then derive percent and status.
+
+    The parse worker streams parent batches while it is still parsing, so a document is only
+    complete once `parsing_complete` is set (documents without the field count as complete)
+    and every announced parent chunk has been processed.
+
+    With `job_id`, the job is recorded in `processed_jobs`; pair it with a
+    `{"processed_jobs": {"$ne": job_id}}` filter so a redelivered job is counted once.
+    """
+    pipeline = []
+    if parsing_complete is not None:
+        pipeline.append({"$set": {"parsing_complete": parsing_complete}})
+    if job_id is not None:
+        pipeline.append({
+            "$set": {
+                "processed_jobs": {"$concatArrays": [{"$ifNull": ["$processed_jobs", []]}, [job_id]]}
+            }
+        })
+
+    is_complete = {
+        "$and": [
+            {"$ne": ["$parsing_complete", False]},
+            {
+                "$eq": [
+                    "$number_of_chunk_processed",
+                    "$number_of_parent_chunks"
+                ]
+            }
+        ]
+    }
+    pipeline.extend([
+        {
+            "$set": {
+                "number_of_chunk_processed": {
+                    "$add": ["$number_of_chunk_processed", parents_done]
+                }
+            }
+        },
+        {
+            "$set": {
+                "percent_complete": {
+                    # 100 is reserved for the "processed" transition below
+                    "$min": [
+                        99,
+                        {
+                            "$toInt": {
+                                "$multiply": [
+                                    {
+                                        "$divide": [
+                                            "$number_of_chunk_processed",
+                                            {"$max": ["$number_of_parent_chunks", 1]}
+                                        ]
+                                    },
+                                    100
+                                ]
+                            }
+                        }
+                    ]
+                }
+            }
+        },
+        {
+            "$set": {
+                "status": {"$cond": [is_complete, "processed", "$status"]},
+                "percent_complete": {"$cond": [is_complete, 100, "$percent_complete"]}
+            }
+        }
+    ])
+    return pipeline
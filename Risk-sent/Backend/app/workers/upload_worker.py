@@ -1,4 +1,5 @@
 import asyncio
+import hashlib
 import struct
 import json
 import signal
@@ -6,18 +7,49 @@ from app.services.redis import redis_client
 from app.core.logging import logging
 from app.db.client import mongo_client
 from langchain_core.documents import Document
-from langchain_huggingface import HuggingFaceEmbeddings
+from app.services.embedding_client import build_embeddings
+from app.workers.embedding_pool import EmbeddingPool, embed_grouped
+from app.workers.job_scheduler import JobScheduler
+from app.workers.embedding_memo import ChunkEmbeddingMemo
+from app.workers.progress import progress_pipeline
+from app.services.retrieval_cache import invalidate_document
+from app.utils.chunking import child_chunks_metadata
+from app.utils.lexical import lexical_fields
+from app.utils.vector_codec import encode_embedding
+from app.core.config import settings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
 
 logger = logging.getLogger(__name__)
 
+DUPLICATE_KEY = 11000
+
+
+def derived_id(job_id: str, *parts) -> ObjectId:
+    """Stable ObjectId for the n-th record of a job, so a redelivered job rewrites the same ids."""
+    key = ":".join([job_id, *map(str, parts)])
+    return ObjectId(hashlib.sha256(key.encode("utf-8")).digest()[:12])
+
+
+async def insert_once(collection, records):
+    """insert_many that treats records already written by an earlier delivery as done."""
+    try:
+        await collection.insert_many(records, ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(err.get("code") != DUPLICATE_KEY for err in errors) or e.details.get("writeConcernErrors"):
+            raise
+        logger.info(f"Skipped {len(errors)} records already in {collection.name}")
+
 class UploadWorker:
-    def __init__(self , queue_name):
+    def __init__(self , queue_name , concurrency=6):
         self.queue_name = queue_name
         self.running = True
         self.db = None
-        self.MAX_JOB = 6
+        self.concurrency = concurrency
+        self.scheduler = None
 
     async def start(self):
         # 1. Connect to Redis
@@ -27,10 +59,21 @@ class UploadWorker:
             await mongo_client.connect()
             self.db = mongo_client.db
 
-            self.embeddings = HuggingFaceEmbeddings(
-                model_name="sentence-transformers/all-MiniLM-L6-v2",
-                model_kwargs={'device': 'cpu'}
-            )
+            # Remote: the embedding daemon batches for us. Local: shard across a process pool
+            if settings.EMBEDDING_BACKEND.lower() == "remote":
+                self.embeddings = build_embeddings()
+            else:
+                self.embeddings = EmbeddingPool(
+                    kind=settings.EMBEDDING_POOL_KIND,
+                    workers=settings.EMBEDDING_POOL_WORKERS,
+                    torch_threads=settings.EMBEDDING_TORCH_THREADS,
+                    max_pending=settings.EMBEDDING_POOL_MAX_PENDING
+                )
+
+            # Chunks already embedded by an earlier filing are reused, only new text hits the model
+            self.embedder = self.embeddings
+            if settings.CHUNK_EMBEDDING_MEMO:
+                self.embedder = ChunkEmbeddingMemo(self.db, self.embeddings, settings.EMBEDDING_MODEL)
             
             self.child_splitter = RecursiveCharacterTextSplitter(chunk_size=400, chunk_overlap=40)
 
@@ -40,21 +83,18 @@ class UploadWorker:
 
 
     async def _redis_worker_loop(self):
-        """Pulls jobs from Redis and hands them to C++."""
+        """Pulls jobs from Redis and runs up to `concurrency` of them at once."""
     
         logger.info(f"Worker started. Listening to {self.queue_name}")
+        self.scheduler = JobScheduler(
+            self.redis,
+            self.queue_name,
+            self._process_job,
+            concurrency=self.concurrency,
+            worker_id=settings.UPLOAD_WORKER_ID or None
+        )
         try:
-            while self.running:
-                # Long-poll Redis
-                while(self.MAX_JOB == 0) :
-                    await asyncio.sleep(2)
-                result = await self.redis.brpop(self.queue_name, timeout=2)
-                if result:
-                    _, message = result
-                    job_data = json.loads(message)
-                    # Create a task so we can handle multiple jobs concurrently
-                    asyncio.create_task(self._process_job(job_data))
-                    
+            await self.scheduler.run()
         except Exception as e:
             logger.error(f"Redis Loop Error: {e}")
 
@@ -62,7 +102,6 @@ class UploadWorker:
     async def _process_job(self, payload):
         """Orchestrates a single job."""
        
-        self.MAX_JOB -= 1
         job_id = payload['job_id']
         data = payload['data']
         doc_id = data['doc_id']
@@ -71,125 +110,111 @@ class UploadWorker:
 
         logger.info(f"Processing batch for Job={job_id}, Doc={doc_id}")
 
-        for p_data in parent_docs_batch:
-            # 1. Insert Parent into DB
-            parent_record = {
+        # 1. Split every parent of the batch into child chunks
+        child_texts_batch = [
+            self.child_splitter.split_text(p_data['text'])
+            for p_data in parent_docs_batch
+        ]
+
+        # 2. Generate Embeddings for the whole batch in one call (this is usually the bottleneck)
+        embeddings_batch = await embed_grouped(self.embedder, child_texts_batch)
+
+        # 3. Pre-assign ids so parents and children go out in one round trip each.
+        # They are derived from the job, so a retried or requeued job can't duplicate chunks
+        parent_records = []
+        child_records = []
+        for i, (p_data, child_texts, embeddings) in enumerate(zip(parent_docs_batch, child_texts_batch, embeddings_batch)):
+            parent_id = derived_id(job_id, "p", i)
+            parent_records.append({
+                "_id": parent_id,
                 "doc_id": doc_id,
                 "owner_id": user_id,
                 "text": p_data['text'],
                 "metadata": p_data['metadata']
-            }
-            parent_insert = await self.db.parents.insert_one(parent_record)
-
-            # 2. Split into Child Chunks
-            child_texts = self.child_splitter.split_text(p_data['text'])
-            
-            if child_texts:
-                # 3. Generate Embeddings (this is usually the bottleneck)
-                # Ensure this is thread-safe if using local models
-                embeddings = self.embeddings.embed_documents(child_texts)
-
-                # 4. Bulk Insert Children
-                child_records = [
-                    {
-                        "parent_id": parent_insert.inserted_id,
-                        "doc_id": doc_id,
-                        "owner_id": user_id,
-                        "embedding": vector,
-                        "text_snippet": text
-                    }
-                    for text, vector in zip(child_texts, embeddings)
-                ]
-                await self.db.children.insert_many(child_records)
-                await self.db.document.update_one(
-                    {"_id": ObjectId(doc_id)},
-                    [
-                        {
-                            "$set": {
-                                "number_of_chunk_processed": {
-                                    "$add": ["$number_of_chunk_processed", 1]
-                                }
-                            }
-                        },
-                        {
-                            "$set": {
-                                "percent_complete": {
-                                    "$toInt": {
-                                        "$multiply": [
-                                            {
-                                                "$divide": [
-                                                    "$number_of_chunk_processed",
-                                                    "$number_of_parent_chunks"
-                                                ]
-                                            },
-                                            100
-                                        ]
-                                    }
-                                }
-                            }
-                        }
-                    ]
-                )
-
-        # 5. Update Progress in MongoDB
-        # You may want to use $inc to increment 'number_of_chunk_processed' 
-        # based on len(parent_docs_batch)
-        await self.db.document.update_one(
-            {"_id": ObjectId(doc_id)},
-            [
+            })
+            # Page span of every child, derived from the parent's page breaks (no re-parsing)
+            child_metadata = child_chunks_metadata(p_data['metadata'], p_data['text'], child_texts, self.child_splitter._chunk_overlap)
+            child_records.extend(
                 {
-                    "$set": {
-                        "status": {
-                            "$cond": [
-                                {
-                                    "$eq": [
-                                        "$number_of_chunk_processed",
-                                        "$number_of_parent_chunks"
-                                    ]
-                                },
-                                "processed",
-                                "$status"
-                            ]
-                        },
-                        "percent_complete": {
-                            "$cond": [
-                                {
-                                    "$eq": [
-                                        "$number_of_chunk_processed",
-                                        "$number_of_parent_chunks"
-                                    ]
-                                },
-                                100,
-                                "$percent_complete"
-                            ]
-                        }
-                    }
+                    "_id": derived_id(job_id, "c", i, j),
+                    "parent_id": parent_id,
+                    "doc_id": doc_id,
+                    "owner_id": user_id,
+                    **encode_embedding(vector, settings.EMBEDDING_STORAGE),
+                    "text_snippet": text,
+                    "metadata": metadata,
+                    "lexical": lexical_fields(text)
                 }
-            ]
-        )
-        self.MAX_JOB += 1
-
+                for j, (text, vector, metadata) in enumerate(zip(child_texts, embeddings, child_metadata))
+            )
 
-        
-        
+        # 4. Bulk Insert Parents and Children concurrently (ids are already known)
+        writes = []
+        if parent_records:
+            writes.append(insert_once(self.db.parents, parent_records))
+        if child_records:
+            writes.append(insert_once(self.db.children, child_records))
+        await asyncio.gather(*writes)
+
+        # 5. Update Progress in MongoDB, once per job_id (a redelivery matches nothing)
+        document = await self.db.document.find_one_and_update(
+            {"_id": ObjectId(doc_id), "processed_jobs": {"$ne": job_id}},
+            progress_pipeline(len(parent_records), job_id=job_id),
+            projection={"status": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        # The batch completing the document clears results cached while it was partial
+        if document and document.get("status") == "processed":
+            await invalidate_document(self.redis, doc_id)
+
+        # Parsing failed meanwhile: the parse worker may have cleaned up before these writes
+        if document is None:
+            document = await self.db.document.find_one({"_id": ObjectId(doc_id)}, {"status": 1})
+        if document and document.get("status") == "Failed":
+            logger.info(f"doc_id={doc_id} failed, discarding the chunks of Job={job_id}")
+            await asyncio.gather(
+                self.db.children.delete_many({"_id": {"$in": [c["_id"] for c in child_records]}}),
+                self.db.parents.delete_many({"_id": {"$in": [p["_id"] for p in parent_records]}})
+            )
 
     def stop(self):
-        """Cleanup logic."""
+        """Stops pulling new jobs."""
         self.running = False
+        if self.scheduler:
+            self.scheduler.stop()
+
+    async def shutdown(self):
+        """Lets in-flight jobs finish, then releases the embedding pool."""
+        self.stop()
+        if self.scheduler:
+            await self.scheduler.drain(timeout=settings.UPLOAD_WORKER_DRAIN_TIMEOUT)
+        if isinstance(getattr(self, "embedder", None), ChunkEmbeddingMemo):
+            logger.info(f"Chunk embedding memo stats {self.embedder.stats()}")
+        if isinstance(getattr(self, "embeddings", None), EmbeddingPool):
+            logger.info(f"Embedding pool stats {self.embeddings.stats()}")
+            self.embeddings.shutdown()
         logger.info("Closing Event loop...")
 
 
 
 
 async def main():
-    worker = UploadWorker("upload_queue")
+    worker = UploadWorker("upload_queue", concurrency=settings.UPLOAD_WORKER_CONCURRENCY)
+
+    # Graceful drain on Ctrl+C / SIGTERM (signal handlers are not available on Windows loops)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, worker.stop)
+        except NotImplementedError:
+            pass
 
     try:
         await worker.start()
     except asyncio.CancelledError:
         pass
     finally:
-        worker.stop()
+        await worker.shutdown()
 
 # --- Main Entry Point ---
 if __name__ == "__main__":
@@ -1,3 +1,11 @@
+// Parser child process driven by app/workers/parser_pool.py (framing in parser_protocol.py).
+// The binary is not tracked; build it next to this file after any protocol change:
+//
+//   g++ -O2 -std=c++17 worker.cpp -o worker $(pkg-config --cflags --libs poppler-cpp) -lspdlog -lfmt -pthread
+//
+// Needs libpoppler-cpp-dev, libspdlog-dev and nlohmann/json (json.hpp) on the include path.
+// PARSER_EXECUTABLE must point at the result.
+
 #include <iostream>
 #include <string>
 #include <vector>
@@ -6,6 +14,7 @@
 #include <condition_variable>
 #include <queue>
 #include <cstdint>
+#include <cstring>
 #include "json.hpp"
 #include <poppler/cpp/poppler-document.h>
 #include <poppler/cpp/poppler-page.h>
@@ -20,6 +29,7 @@ using json = nlohmann::json;
 struct Job {
     string id;
     string path;
+    bool stream;
 };
 
 queue<Job> job_queue;
@@ -42,17 +52,81 @@ bool read_exactly(char* buffer, size_t size) {
     return true;
 }
 
-// --- Function to send binary-framed JSON to Python ---
-void send_to_python(const json& j) {
-    string s = j.dump();
-    uint32_t len = static_cast<uint32_t>(s.size());
+// --- Binary response frames (see app/workers/parser_protocol.py) ---
+// magic "RSPF" | version u8 | kind u8 | status u8 | pad u8 | job_id_len u16 | pad u16 |
+// page_count u32 | body_len u32 | body
+const char FRAME_MAGIC[4] = {'R', 'S', 'P', 'F'};
+const uint8_t PROTOCOL_VERSION = 1;
+const uint8_t FRAME_RESULT = 1;  // whole document: page length table + pages
+const uint8_t FRAME_PAGE = 2;    // streaming: one page, page_count carries the page number
+const uint8_t FRAME_END = 3;     // streaming: job done, page_count carries the total pages
+const uint8_t STATUS_OK = 0;
+const uint8_t STATUS_FAILED = 1;
+
+#pragma pack(push, 1)
+struct FrameHeader {
+    char magic[4];
+    uint8_t version;
+    uint8_t kind;
+    uint8_t status;
+    uint8_t pad0;
+    uint16_t job_id_len;
+    uint16_t pad1;
+    uint32_t page_count;
+    uint32_t body_len;
+};
+#pragma pack(pop)
+
+FrameHeader make_header(uint8_t kind, uint8_t status, const string& job_id, uint32_t page_count, uint64_t body_len) {
+    FrameHeader header{};
+    memcpy(header.magic, FRAME_MAGIC, sizeof(FRAME_MAGIC));
+    header.version = PROTOCOL_VERSION;
+    header.kind = kind;
+    header.status = status;
+    header.job_id_len = static_cast<uint16_t>(job_id.size());
+    header.page_count = page_count;
+    header.body_len = static_cast<uint32_t>(body_len);
+    return header;
+}
+
+// Writes header + job id + (page length table + raw pages | error message).
+// Pages are written straight from their buffers, never concatenated or JSON-escaped.
+void send_frame(const string& job_id, uint8_t status, const vector<string>& pages, const string& error) {
+    vector<uint32_t> page_lengths;
+    uint64_t body_len = job_id.size();
+    if (status == STATUS_OK) {
+        for (const auto& page : pages) {
+            page_lengths.push_back(static_cast<uint32_t>(page.size()));
+            body_len += sizeof(uint32_t) + page.size();
+        }
+    } else {
+        body_len += error.size();
+    }
+    uint32_t page_count = status == STATUS_OK ? static_cast<uint32_t>(pages.size()) : 0;
+    FrameHeader header = make_header(FRAME_RESULT, status, job_id, page_count, body_len);
 
     // Lock the output stream so threads don't mix their bytes
     lock_guard<mutex> lock(cout_mutex);
-    
-    // 4-byte header + JSON body
-    cout.write(reinterpret_cast<const char*>(&len), sizeof(len));
-    cout.write(s.data(), len);
+
+    cout.write(reinterpret_cast<const char*>(&header), sizeof(header));
+    cout.write(job_id.data(), job_id.size());
+    if (status == STATUS_OK) {
+        cout.write(reinterpret_cast<const char*>(page_lengths.data()), page_lengths.size() * sizeof(uint32_t));
+        for (const auto& page : pages) cout.write(page.data(), page.size());
+    } else {
+        cout.write(error.data(), error.size());
+    }
+    cout.flush();
+}
+
+// Streaming mode: header + job id + one page's text (PAGE) or the error message (END)
+void send_stream_frame(uint8_t kind, uint8_t status, const string& job_id, uint32_t page_field, const string& payload) {
+    FrameHeader header = make_header(kind, status, job_id, page_field, job_id.size() + payload.size());
+
+    lock_guard<mutex> lock(cout_mutex);
+    cout.write(reinterpret_cast<const char*>(&header), sizeof(header));
+    cout.write(job_id.data(), job_id.size());
+    cout.write(payload.data(), payload.size());
     cout.flush();
 }
 
@@ -75,42 +149,44 @@ void worker_thread_func(int thread_id) {
 
         cerr << "[C++ Thread " << thread_id << "] Processing Job: " << current_job.id << endl;
         
-        // --- SIMULATE PDF WORK ---
-        string extracted_text = "";
-        string status = "Success";
+        // --- PDF WORK ---
+        vector<string> pages;
+        uint8_t status = STATUS_OK;
         string error = "";
+        int num_pages = 0;
         // 1. Load the document
         poppler::document* doc = poppler::document::load_from_file(current_job.path);
         
         if (!doc) {
             cerr << "[C++ Error] Could not open file: " << current_job.path << endl;
-            status = "Failed";
+            status = STATUS_FAILED;
             error = "Could not open file";
 
         } else {
             // 2. Loop through all pages
-            int num_pages = doc->pages();
+            num_pages = doc->pages();
+            if (!current_job.stream) pages.reserve(num_pages);
             for (int i = 0; i < num_pages; ++i) {
                 poppler::page* p = doc->create_page(i);
+                string page_text;
                 if (p) {
                     // 3. Extract text from the page
                     // The 'to_utf8()' ensures we handle special characters correctly
-                    poppler::ustring u_text = p->text();
-                    extracted_text += u_text.to_utf8().data();
-                    extracted_text += "\n"; // Add spacing between pages
+                    poppler::byte_array utf8 = p->text().to_utf8();
+                    page_text.assign(utf8.begin(), utf8.end());
                     delete p;
                 }
+                page_text += "\n"; // Add spacing between pages
+
+                // Streaming: hand the page to Python right away instead of holding the document
+                if (current_job.stream) send_stream_frame(FRAME_PAGE, STATUS_OK, current_job.id, i + 1, page_text);
+                else pages.push_back(move(page_text));
             }
             delete doc;
         }        
 
-        json response;
-        response["job_id"] = current_job.id;
-        response["text"] = extracted_text;
-        response["status"] = status;
-        if(status == "Failed")response["error"] = error;
-
-        send_to_python(response);
+        if (current_job.stream) send_stream_frame(FRAME_END, status, current_job.id, num_pages, error);
+        else send_frame(current_job.id, status, pages, error);
     }
 }
 
@@ -156,7 +232,7 @@ int main() {
             
             {
                 lock_guard<mutex> lock(queue_mutex);
-                job_queue.push({input["job_id"], input["file_path"]});
+                job_queue.push({input["job_id"], input["file_path"], input.value("stream", false)});
             }
             queue_cv.notify_one();
 
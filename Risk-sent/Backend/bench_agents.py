@@ -0,0 +1,95 @@
+"""
+Per-message agent overhead: compiling a react agent for every message (what get_agent used to
+do) against reusing the agents compiled once in RiskAgentManager.initialize().
+
+A fake chat model answers right away, so the numbers are the graph/tool overhead only, without
+Groq or MCP round trips.
+
+python bench_agents.py [--messages 200]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from itertools import cycle
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.tools import StructuredTool
+from langgraph.prebuilt import create_react_agent
+from app.utils.uploads import wrap_tool_with_context
+
+
+class BenchChatModel(GenericFakeChatModel):
+    """Answers without calling tools; binding tools is a no-op."""
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+async def semantic_search(query: str, doc_id: str = None):
+    return []
+
+
+def build_llm():
+    return BenchChatModel(messages=cycle([AIMessage(content="No material risks found.")]))
+
+
+def summary(timings):
+    timings = sorted(timings)
+    return {
+        "mean_ms": round(statistics.mean(timings), 3),
+        "p50_ms": round(timings[len(timings) // 2], 3),
+        "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 3)
+    }
+
+
+async def per_message_compile(llm, search_tool, messages):
+    """Before: tools wrapped and a graph compiled for each message."""
+    setup, total = [], []
+    for _ in range(messages):
+        started = time.perf_counter()
+        agent = create_react_agent(llm, tools=[wrap_tool_with_context(search_tool)])
+        compiled = time.perf_counter()
+        await agent.ainvoke({"messages": [HumanMessage(content="What are the liquidity risks?")]})
+        finished = time.perf_counter()
+        setup.append((compiled - started) * 1000)
+        total.append((finished - started) * 1000)
+    return setup, total
+
+
+async def precompiled(llm, search_tool, messages):
+    """After: one graph, the doc_id travels in the run config."""
+    agent = create_react_agent(llm, tools=[wrap_tool_with_context(search_tool)])
+    setup, total = [], []
+    for i in range(messages):
+        started = time.perf_counter()
+        config = {"configurable": {"doc_id": f"doc-{i % 10}"}}
+        compiled = time.perf_counter()
+        await agent.ainvoke({"messages": [HumanMessage(content="What are the liquidity risks?")]}, config=config)
+        finished = time.perf_counter()
+        setup.append((compiled - started) * 1000)
+        total.append((finished - started) * 1000)
+    return setup, total
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-message agent setup, before and after precompiling")
+    parser.add_argument("--messages", type=int, default=200)
+    args = parser.parse_args()
+
+    llm = build_llm()
+    search_tool = StructuredTool.from_function(
+        coroutine=semantic_search,
+        name="semantic_search",
+        description="Searches the risk document."
+    )
+    # Warm-up: imports and first compilation are paid once in both cases
+    await per_message_compile(llm, search_tool, 5)
+
+    for name, run in (("per-message compile", per_message_compile), ("precompiled", precompiled)):
+        setup, total = await run(llm, search_tool, args.messages)
+        print(f"{name:>20}: get_agent {summary(setup)}  message {summary(total)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,5 +1,9 @@
+import argparse
 from mcp.server.fastmcp import FastMCP
-from app.services.ai_service import rag_service  # Importing your RAG brain
+from app.services.rag_tools import semantic_search as rag_semantic_search  # Importing your RAG brain
+from app.services.rag_tools import portfolio_search as rag_portfolio_search
+from app.services.ai_service import rag_service
+from typing import List, Optional
 import sys
 import logging
 import sys
@@ -8,7 +12,8 @@ logger = logging.getLogger(__name__)
 
 
 # Initialize the Specialist Server
-mcp = FastMCP("RiskSensingSpecialist")
+# Stateless HTTP: any worker can answer any request, so the HTTP tier scales horizontally
+mcp = FastMCP("RiskSensingSpecialist", stateless_http=True, json_response=True)
 
 # Defineing the Specialist Tool
 @mcp.tool()
@@ -16,29 +21,42 @@ async def semantic_search(query: str , doc_id : str) -> str:
     """
     Search for any specific context.
     """
-    try:
-        # Trigger the RAG Engine
-        # Returns Parent paragraphs (rich context) for better AI reasoning
-        logger.info("The tool is called in the MCP server")
-        if not doc_id :
-            return "**ERROR** : Cannot use this tool"
-        retrieved_docs = await rag_service.search_risks(query , doc_id)
-        
-        if not retrieved_docs:
-            return "No specific risks found for this query in the documents."
-
-        # Formatting the "Observation" for the LLM
-        formatted_results = []
-        for doc in retrieved_docs:
-            page_num = doc.get("page", "Unknown")
-            content = doc.get("text", "Unknown").strip()
-            formatted_results.append(f"--- [SOURCE: PAGE {page_num}] ---\n{content}")
-
-        return "\n\n".join(formatted_results)
-
-    except Exception as e:
-        return f"Error during document retrieval: {str(e)}"
-
-# Launch via STDIO Transport
+    # Trigger the RAG Engine (same code path as the in-process tool)
+    logger.info("The tool is called in the MCP server")
+    return await rag_semantic_search(query, doc_id)
+
+@mcp.tool()
+async def portfolio_search(query: str , owner_id : str , doc_ids : Optional[List[str]] = None) -> str:
+    """
+    Search across all of the user's documents at once (or the given doc_ids), e.g. to compare risks between filings.
+    """
+    logger.info("The portfolio tool is called in the MCP server")
+    return await rag_portfolio_search(query, owner_id, doc_ids)
+
+def preload():
+    """Loads the reranker in the background, so the first searches don't fall back while it loads."""
+    if rag_service.reranker:
+        rag_service.reranker.preload()
+
+def create_app():
+    """ASGI app for the streamable HTTP transport (served at /mcp), one per uvicorn worker."""
+    preload()
+    return mcp.streamable_http_app()
+
+
+# Launch via STDIO (child of the API process) or streamable HTTP (standalone retrieval tier)
+#   python -m mcp-server.server --transport http --host 0.0.0.0 --port 8001 --workers 4
 if __name__ == "__main__":
-    mcp.run(transport="stdio")
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--transport", choices=["stdio", "http"], default="stdio")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.transport == "http":
+        import uvicorn
+        uvicorn.run("mcp-server.server:create_app", factory=True, host=args.host, port=args.port, workers=args.workers)
+    else:
+        preload()
+        mcp.run(transport="stdio")
@@ -0,0 +1,135 @@
+import random
+
+import pytest
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from app.utils.chunking import StreamingSplitter, locate_chunks, child_chunks_metadata
+
+WORDS = ["risk", "market", "credit", "liquidity", "the", "of", "and", "exposure", "rates", "counterparty"]
+
+
+def stream(pages, chunk_size=1500, chunk_overlap=150, max_buffer=None):
+    splitter = StreamingSplitter(
+        RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap),
+        {"source": "doc"},
+        max_buffer=max_buffer
+    )
+    documents = []
+    for page_number, page in enumerate(pages, start=1):
+        documents.extend(splitter.feed(page, page_number))
+    documents.extend(splitter.flush())
+    return documents
+
+
+def reference(pages, chunk_size=1500, chunk_overlap=150):
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, add_start_index=True)
+    return splitter.create_documents(["".join(pages)])
+
+
+def random_pages(seed, count=30):
+    rng = random.Random(seed)
+
+    def paragraph():
+        return " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, rng.choice([10, 80, 400, 900]))))
+
+    pages = []
+    for _ in range(count):
+        separator = rng.choice(["\n\n", "\n", " "])
+        pages.append(separator.join(paragraph() for _ in range(rng.randint(1, 4))) + rng.choice(["\n\n", "\n", " ", ""]))
+    return pages
+
+
+def assert_matches_split_text(pages, max_buffer=None, **sizes):
+    text = "".join(pages)
+    streamed = stream(pages, max_buffer=max_buffer, **sizes)
+    expected = reference(pages, **sizes)
+    assert [d.page_content for d in streamed] == [d.page_content for d in expected]
+
+    offsets = [d.metadata["char_start"] for d in streamed]
+    assert offsets == sorted(offsets)
+    for document, start in zip(streamed, offsets):
+        assert text[start:document.metadata["char_end"]] == document.page_content
+    # Where the chunk text is unique the offset is unambiguous (add_start_index can pick an
+    # earlier copy of a short chunk inside the overlap window)
+    for document, reference_document in zip(streamed, expected):
+        if text.count(document.page_content) == 1:
+            assert document.metadata["char_start"] == reference_document.metadata["start_index"]
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_streamed_chunks_match_split_text(seed):
+    assert_matches_split_text(random_pages(seed))
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_streamed_chunks_match_split_text_small_chunks(seed):
+    # Paragraphs here are far longer than 50 chunks, which max_buffer would otherwise cut early
+    assert_matches_split_text(random_pages(seed, count=10), max_buffer=10**7, chunk_size=300, chunk_overlap=30)
+
+
+def test_long_split_is_cut_to_bound_the_buffer():
+    pages = [" ".join(WORDS * 40) for _ in range(40)]
+    splitter = StreamingSplitter(RecursiveCharacterTextSplitter(chunk_size=300, chunk_overlap=30), {}, max_buffer=3000)
+    text = "".join(pages)
+    documents = []
+    for page_number, page in enumerate(pages, start=1):
+        documents.extend(splitter.feed(page, page_number))
+        assert len(splitter.buffer) <= 3000 + len(page)
+    documents.extend(splitter.flush())
+    for document in documents:
+        assert text[document.metadata["char_start"]:document.metadata["char_end"]] == document.page_content
+    assert documents[-1].metadata["char_end"] == len(text.rstrip())
+
+
+def test_separator_first_seen_late():
+    # No blank line until page 4: everything before it is one split the splitter recursed into
+    pages = [" ".join(WORDS * 60) + "\n" for _ in range(3)] + ["end\n\n" + " ".join(WORDS * 20)]
+    assert_matches_split_text(pages)
+
+
+def test_repetitive_lines():
+    pages = ["x\n"] * 3000
+    streamed = stream(pages)
+    assert len(streamed) == len(reference(pages)) == 5
+    assert_matches_split_text(pages)
+
+
+def test_identical_pages():
+    pages = ["a" * 499 + "\n"] * 200
+    streamed = stream(pages)
+    assert len(streamed) == len(reference(pages))
+    assert_matches_split_text(pages)
+
+
+def test_offsets_point_at_the_chunk_text():
+    pages = random_pages(7)
+    text = "".join(pages)
+    for document in stream(pages):
+        assert text[document.metadata["char_start"]:document.metadata["char_end"]] == document.page_content
+
+
+def test_page_span():
+    pages = ["first page " * 100, "second page " * 100, "third page " * 100]
+    documents = stream(pages, chunk_size=500, chunk_overlap=50)
+    assert documents[0].metadata["page_start"] == 1
+    assert documents[-1].metadata["page_end"] == 3
+    starts = [d.metadata["page_start"] for d in documents]
+    assert starts == sorted(starts)
+
+
+def test_locate_chunks_on_repetitive_text():
+    text = "ab" * 200
+    chunks = RecursiveCharacterTextSplitter(chunk_size=50, chunk_overlap=10).split_text(text)
+    offsets = locate_chunks(text, chunks, chunk_overlap=10)
+    assert offsets == sorted(offsets)
+    assert offsets[-1] + len(chunks[-1]) == len(text)
+
+
+def test_child_chunks_metadata():
+    parent = "alpha beta gamma " * 40
+    children = RecursiveCharacterTextSplitter(chunk_size=100, chunk_overlap=20).split_text(parent)
+    metadata = child_chunks_metadata({"page_breaks": [[3, 0], [4, 300]], "char_start": 1000}, parent, children, 20)
+    assert metadata[0]["page"] == 3
+    assert metadata[-1]["page_end"] == 4
+    for child, meta in zip(children, metadata):
+        assert parent[meta["char_start"] - 1000:meta["char_end"] - 1000] == child
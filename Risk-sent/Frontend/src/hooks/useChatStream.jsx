@@ -47,6 +47,8 @@ export const useChatStream = () => {
       const reader = response.body.getReader();
       const decoder = new TextDecoder();
       let tokenQueue = "";
+      let pending = "";
+      let streamedTokens = false;
 
       const drainInterval = setInterval(() => {
         if (tokenQueue.length > 0) {
@@ -72,14 +74,28 @@ export const useChatStream = () => {
           break;
         }
 
-        const chunk = decoder.decode(value);
-        const lines = chunk.split('\n');
+        // A frame can be split across reads, keep the unfinished line for the next one
+        pending += decoder.decode(value, { stream: true });
+        const lines = pending.split('\n');
+        pending = lines.pop();
 
         lines.forEach(line => {
           if (!line.trim()) return;
           try {
             const data = JSON.parse(line);
-            if (data.answer) {
+            // A new model turn started: what was streamed so far is not the answer
+            if (data.reset) {
+              tokenQueue = "";
+              setMessages(prev => prev.map(m =>
+                m.id === aiMsgId ? { ...m, content: '' } : m
+              ));
+            }
+            if (data.token) {
+              streamedTokens = true;
+              tokenQueue += data.token;
+            }
+            // Full answer only matters if the tokens were not streamed
+            if (data.answer && !streamedTokens) {
               tokenQueue += data.answer;
             }
             if (data.step) setCurrentStep(data.step);